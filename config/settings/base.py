@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',  # OpClass() in index expressions
     
     # Third party apps
     'rest_framework',
@@ -159,6 +160,22 @@ CELERY_WORKER_MAX_TASKS_PER_CHILD = config('CELERY_WORKER_MAX_TASKS_PER_CHILD',
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_CACHE_BACKEND = 'default'
 CELERY_RESULT_EXTENDED = True
+# Long-running import chunks: don't let one worker reserve several at once
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+# Separate queues so short webhook deliveries never wait behind long imports;
+# run a worker per queue (see docker-compose.yml)
+CELERY_TASK_ROUTES = {
+    'products.tasks.process_csv_import': {'queue': 'imports'},
+    'products.tasks.process_csv_chunk': {'queue': 'imports'},
+    'products.tasks.finalize_csv_import': {'queue': 'imports'},
+    'products.tasks.trigger_webhooks': {'queue': 'webhooks'},
+    'webhooks.tasks.send_webhook': {'queue': 'webhooks'},
+    'webhooks.tasks.send_webhook_batch': {'queue': 'webhooks'},
+}
+
+# CSV Import Settings
+# Process import chunks as parallel Celery subtasks (merged by a chord callback)
+CSV_IMPORT_PARALLEL = config('CSV_IMPORT_PARALLEL', default=False, cast=bool)
 
 # Django REST Framework
 REST_FRAMEWORK = {
@@ -3,8 +3,8 @@ Product admin configuration
 """
 
 from django.contrib import admin
-from django.utils.html import format_html
-from .models import Product, UploadJob, AuditLog
+from django.utils.html import format_html, format_html_join
+from .models import Product, UploadJob, UploadJobError, AuditLog
 
 
 @admin.register(Product)
@@ -31,6 +31,19 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Only fetch the columns shown in the changelist"""
+        return super().get_queryset(request).only(
+            'id', 'sku', 'name', 'is_active', 'created_at', 'updated_at'
+        )
+    
+    def get_object(self, request, object_id, from_field=None):
+        """Load the columns the changelist skips for the change form"""
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            obj.refresh_from_db(fields=['sku_lower', 'description'])
+        return obj
+    
     def is_active_badge(self, obj):
         """Display active status as badge"""
         if obj.is_active:
@@ -60,7 +73,7 @@ class UploadJobAdmin(admin.ModelAdmin):
         'processed_rows', 'success_count', 'error_count',
         'created_count', 'updated_count', 'skipped_count',
         'started_at', 'completed_at', 'created_at', 'updated_at',
-        'progress_percentage', 'duration'
+        'progress_percentage', 'duration', 'recent_errors'
     ]
     list_per_page = 25
     date_hierarchy = 'created_at'
@@ -79,7 +92,7 @@ class UploadJobAdmin(admin.ModelAdmin):
             )
         }),
         ('Error Details', {
-            'fields': ('error_details',),
+            'fields': ('recent_errors',),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -114,6 +127,32 @@ class UploadJobAdmin(admin.ModelAdmin):
             percentage, percentage
         )
     progress_bar.short_description = 'Progress'
+    
+    def recent_errors(self, obj):
+        """Display the first errors of the job"""
+        errors = obj.row_errors.only('row_number', 'error')[:20]
+        if not errors:
+            return '-'
+        return format_html(
+            '<ul>{}</ul>',
+            format_html_join('', '<li>Row {}: {}</li>', ((e.row_number, e.error) for e in errors))
+        )
+    recent_errors.short_description = 'Errors (first 20)'
+
+
+@admin.register(UploadJobError)
+class UploadJobErrorAdmin(admin.ModelAdmin):
+    """Admin interface for UploadJobError model"""
+    
+    list_display = ['id', 'upload_job_id', 'row_number', 'error', 'timestamp']
+    search_fields = ['error']
+    readonly_fields = ['upload_job', 'row_number', 'error', 'timestamp']
+    raw_id_fields = ['upload_job']
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        """Disable adding errors manually"""
+        return False
 
 
 @admin.register(AuditLog)
@@ -127,6 +166,10 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_per_page = 50
     date_hierarchy = 'timestamp'
     
+    def get_queryset(self, request):
+        """Skip the changes JSON blob on list pages"""
+        return super().get_queryset(request).defer('changes')
+    
     def has_add_permission(self, request):
         """Disable adding audit logs manually"""
         return False
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-15 20:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        # A regular column can't be altered into a generated one,
+        # so drop it and let the database recompute it from sku
+        migrations.RemoveIndex(
+            model_name='product',
+            name='idx_sku_lower',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='sku_lower',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sku_lower',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('sku')), help_text='Lowercase version of SKU for case-insensitive uniqueness (computed by the database)', output_field=models.CharField(max_length=255), unique=True),
+        ),
+    ]
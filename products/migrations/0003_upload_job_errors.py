@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-15 20:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def copy_error_details(apps, schema_editor):
+    """Move existing error_details JSON entries into UploadJobError rows"""
+    UploadJob = apps.get_model('products', 'UploadJob')
+    UploadJobError = apps.get_model('products', 'UploadJobError')
+    
+    jobs = UploadJob.objects.exclude(error_details=[]).exclude(error_details__isnull=True)
+    for job in jobs.only('id', 'error_details').iterator(chunk_size=100):
+        UploadJobError.objects.bulk_create(
+            [
+                UploadJobError(
+                    upload_job_id=job.id,
+                    row_number=entry.get('row') or 0,
+                    error=entry.get('error', ''),
+                    timestamp=parse_datetime(entry.get('timestamp') or '') or django.utils.timezone.now()
+                )
+                for entry in job.error_details
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_sku_lower_generated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJobError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.IntegerField(default=0, help_text='Data row number (0 for job-level errors)')),
+                ('error', models.TextField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('upload_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='row_errors', to='products.uploadjob')),
+            ],
+            options={
+                'verbose_name': 'Upload Job Error',
+                'verbose_name_plural': 'Upload Job Errors',
+                'db_table': 'upload_job_errors',
+                'ordering': ['row_number', 'id'],
+                'indexes': [models.Index(fields=['upload_job', 'row_number'], name='idx_upload_error_job_row')],
+            },
+        ),
+        migrations.RunPython(copy_error_details, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='uploadjob',
+            name='error_details',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-15 20:58
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_upload_job_errors'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['sku', 'name'], name='idx_product_search_trgm', opclasses=['gin_trgm_ops', 'gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-15 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_trgm'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='idx_audit_sku',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['product_sku', '-timestamp'], name='idx_audit_sku_timestamp'),
+        ),
+    ]
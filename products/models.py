@@ -2,7 +2,9 @@
 Product application models
 """
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Lower, Trim, Upper
 from django.core.validators import MinLengthValidator
 from django.utils import timezone
 import json
@@ -17,12 +19,12 @@ class Product(models.Model):
         validators=[MinLengthValidator(1)],
         help_text="Stock Keeping Unit (SKU) - case insensitive unique identifier"
     )
-    sku_lower = models.CharField(
-        max_length=255,
+    sku_lower = models.GeneratedField(
+        expression=Lower(Trim('sku')),
+        output_field=models.CharField(max_length=255),
+        db_persist=True,
         unique=True,
-        db_index=True,
-        editable=False,
-        help_text="Lowercase version of SKU for case-insensitive uniqueness"
+        help_text="Lowercase version of SKU for case-insensitive uniqueness (computed by the database)"
     )
     name = models.CharField(max_length=500)
     description = models.TextField(blank=True, default='')
@@ -34,19 +36,20 @@ class Product(models.Model):
         db_table = 'products'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['sku_lower'], name='idx_sku_lower'),
             models.Index(fields=['is_active'], name='idx_is_active'),
             models.Index(fields=['-created_at'], name='idx_created_at'),
             models.Index(fields=['name'], name='idx_name'),
+            # Trigram index for the list view's icontains search; Django compiles
+            # that to UPPER(col::text) LIKE UPPER('%q%'), so index the same expressions
+            GinIndex(
+                OpClass(Upper('sku'), name='gin_trgm_ops'),
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='idx_product_search_trgm'
+            ),
         ]
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
 
-    def save(self, *args, **kwargs):
-        """Override save to ensure sku_lower is always set"""
-        self.sku_lower = self.sku.lower().strip()
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.sku} - {self.name}"
 
@@ -83,7 +86,6 @@ class UploadJob(models.Model):
     updated_count = models.IntegerField(default=0)
     skipped_count = models.IntegerField(default=0)
     
-    error_details = models.JSONField(null=True, blank=True, default=list)
     task_id = models.CharField(max_length=255, blank=True, null=True)
     
     started_at = models.DateTimeField(null=True, blank=True)
@@ -121,23 +123,18 @@ class UploadJob(models.Model):
 
     @property
     def errors(self):
-        """Return list of error messages"""
-        if self.error_details:
-            return [error.get('error', '') for error in self.error_details]
-        return []
+        """Return queryset of error messages, in row order"""
+        return self.row_errors.values_list('error', flat=True)
 
     def add_error(self, row_number, error_message):
-        """Add an error to the error details"""
-        if self.error_details is None:
-            self.error_details = []
-        
-        self.error_details.append({
-            'row': row_number,
-            'error': str(error_message),
-            'timestamp': timezone.now().isoformat()
-        })
+        """Record a single error against this job"""
+        UploadJobError.objects.create(
+            upload_job=self,
+            row_number=row_number,
+            error=str(error_message)
+        )
         self.error_count += 1
-        self.save(update_fields=['error_details', 'error_count'])
+        self.save(update_fields=['error_count'])
 
     def mark_as_processing(self):
         """Mark job as processing"""
@@ -145,11 +142,15 @@ class UploadJob(models.Model):
         self.started_at = timezone.now()
         self.save(update_fields=['status', 'started_at'])
 
-    def mark_as_completed(self):
+    def mark_as_completed(self, total_rows=None):
         """Mark job as completed"""
         self.status = 'completed'
         self.completed_at = timezone.now()
-        self.save(update_fields=['status', 'completed_at'])
+        update_fields = ['status', 'completed_at']
+        if total_rows is not None:
+            self.total_rows = total_rows
+            update_fields.append('total_rows')
+        self.save(update_fields=update_fields)
 
     def mark_as_failed(self, error_message=None):
         """Mark job as failed"""
@@ -160,6 +161,33 @@ class UploadJob(models.Model):
         self.save(update_fields=['status', 'completed_at'])
 
 
+class UploadJobError(models.Model):
+    """
+    Row-level error recorded during a CSV import
+    Kept out of the UploadJob row so error writes are append-only inserts
+    """
+    upload_job = models.ForeignKey(
+        UploadJob,
+        on_delete=models.CASCADE,
+        related_name='row_errors'
+    )
+    row_number = models.IntegerField(default=0, help_text="Data row number (0 for job-level errors)")
+    error = models.TextField()
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'upload_job_errors'
+        ordering = ['row_number', 'id']
+        indexes = [
+            models.Index(fields=['upload_job', 'row_number'], name='idx_upload_error_job_row'),
+        ]
+        verbose_name = 'Upload Job Error'
+        verbose_name_plural = 'Upload Job Errors'
+
+    def __str__(self):
+        return f"Upload Job {self.upload_job_id} - row {self.row_number}: {self.error[:50]}"
+
+
 class AuditLog(models.Model):
     """
     Audit log for tracking changes to products
@@ -185,7 +213,7 @@ class AuditLog(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['-timestamp'], name='idx_audit_timestamp'),
-            models.Index(fields=['product_sku'], name='idx_audit_sku'),
+            models.Index(fields=['product_sku', '-timestamp'], name='idx_audit_sku_timestamp'),
             models.Index(fields=['action'], name='idx_audit_action'),
         ]
         verbose_name = 'Audit Log'
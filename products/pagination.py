@@ -0,0 +1,90 @@
+"""
+Pagination helpers
+"""
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids an exact COUNT(*) over large result sets
+    
+    The count comes from, in order of preference:
+    - known_count, when the caller already has an exact figure
+    - an exact count, when there are at most max_count objects
+    - Postgres' pg_class.reltuples estimate, for an unfiltered table
+    - Postgres' planner row estimate (EXPLAIN), for a filtered queryset
+    - max_count itself otherwise (count_capped is then True)
+    """
+    
+    def __init__(self, object_list, per_page, known_count=None, max_count=10_000, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = known_count
+        self.max_count = max_count
+        self.count_capped = False
+    
+    @cached_property
+    def count(self):
+        """Exact, estimated or capped number of objects"""
+        if self.known_count is not None:
+            return self.known_count
+        
+        # Counting one past the cap is enough to tell whether we hit it
+        bounded = self.object_list[:self.max_count + 1].count()
+        if bounded <= self.max_count:
+            return bounded
+        
+        estimate = self.table_estimate()
+        if estimate is None:
+            estimate = self.plan_estimate()
+        if estimate is not None and estimate > self.max_count:
+            return estimate
+        
+        self.count_capped = True
+        return self.max_count
+    
+    def table_estimate(self):
+        """
+        Planner row estimate for an unfiltered queryset's table
+        
+        Returns:
+            Estimated row count, or None when not on Postgres, when the
+            queryset is filtered or when the table was never analyzed
+        """
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
+    
+    def plan_estimate(self):
+        """
+        Planner row estimate for a filtered queryset
+        
+        Returns:
+            Estimated row count, or None when not on Postgres
+        """
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        rows = int(plan[0]['Plan']['Plan Rows'])
+        return rows if rows > 0 else None
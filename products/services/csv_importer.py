@@ -4,14 +4,32 @@ Handles CSV file processing with chunked reading and bulk operations
 """
 
 import csv
+import io
 import logging
-from typing import Dict, List, Tuple
-from django.db import transaction
-from products.models import Product, UploadJob
+import mmap
+import os
+import re
+import time
+import warnings
+from typing import Dict, Iterator, List, Tuple
+import pandas as pd
+from django.db import DataError, IntegrityError, ProgrammingError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from products.models import Product, UploadJob, UploadJobError
+from products.services.progress import publish_upload_progress
 from django.core.cache import cache
 
 logger = logging.getLogger(__name__)
 
+_WS_RE = re.compile(r'\s+')
+# Values containing a whitespace run or a non-space whitespace character
+_WS_MESSY_RE = re.compile(r'\s{2,}|[^\S ]')
+# One line of the ParserWarning pandas emits for each line it skips
+_BAD_LINE_RE = re.compile(r'Skipping line (\d+):')
+# SQLSTATE of an ON CONFLICT DO UPDATE that affects the same row twice
+_CARDINALITY_VIOLATION = '21000'
+
 
 class CSVImporter:
     """
@@ -22,6 +40,14 @@ class CSVImporter:
     CHUNK_SIZE = 1000  # Process 1000 rows at a time
     REQUIRED_COLUMNS = ['name', 'sku']  # Updated to match CSV format
     OPTIONAL_COLUMNS = ['description']
+    CHUNK_COLUMNS = ['sku', 'name', 'description']  # Columns kept after normalization
+    OVERFLOW_COLUMN = '__overflow__'  # Parsed past the header's columns to catch long rows
+    UPSERT_FIELDS = ['sku', 'name', 'description']  # Overwritten on SKU match
+    PROGRESS_FLUSH_INTERVAL = 5  # Seconds between progress writes to the database
+    COPY_THRESHOLD = 100_000  # Use COPY for new products on imports larger than this
+    MMAP_MAX_SIZE = 2 * 1024 ** 3  # Count rows through mmap for files up to 2GB
+    COUNT_WINDOW = 4 * 1024 ** 2  # Bytes scanned per step when counting rows
+    READ_BUFFER_SIZE = 4 * 1024 ** 2  # Buffer size for the CSV file handle
     
     def __init__(self, upload_job_id: int, options: Dict = None):
         """
@@ -34,7 +60,6 @@ class CSVImporter:
         self.upload_job = UploadJob.objects.get(id=upload_job_id)
         self.file_path = self.upload_job.file_path.path
         self.options = options or {}
-        self.skip_duplicates = self.options.get('skip_duplicates', True)
         self.deactivate_missing = self.options.get('deactivate_missing', False)
         self.stats = {
             'total': 0,
@@ -44,6 +69,9 @@ class CSVImporter:
             'skipped': 0,
             'errors': 0
         }
+        # Row errors are buffered and written with each progress update
+        self._pending_errors = []
+        self._last_db_flush = 0.0
     
     def validate_headers(self, headers: List[str]) -> Tuple[bool, str]:
         """
@@ -64,209 +92,663 @@ class CSVImporter:
         
         return True, ""
     
-    def normalize_row(self, row: Dict[str, str]) -> Dict[str, str]:
+    def normalize_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Normalize and clean row data
+        Normalize and clean a chunk of rows column-at-a-time
         Handles CSV format: name,sku,description
+        Invalid rows are recorded as errors and dropped
         
         Args:
-            row: Dictionary of row data
+            df: DataFrame of raw row data, indexed by data row position
             
         Returns:
-            Normalized dictionary
-        """
-        # Convert keys to lowercase and strip whitespace
-        normalized = {}
-        for k, v in row.items():
-            if v is not None:
-                # Clean multi-line values and excessive whitespace
-                cleaned_value = ' '.join(str(v).split())
-                normalized[k.lower().strip()] = cleaned_value.strip()
-            else:
-                normalized[k.lower().strip()] = ''
-        
-        # Validate required fields - must have actual values, not empty strings
-        if 'sku' not in normalized or not normalized.get('sku', '').strip():
-            raise ValueError("SKU is required and cannot be empty")
+            DataFrame of valid, normalized rows
+        """
+        df = df.reindex(columns=self.CHUNK_COLUMNS, fill_value='')
         
-        if 'name' not in normalized or not normalized.get('name', '').strip():
-            raise ValueError("Name is required and cannot be empty")
+        # Clean multi-line values and excessive whitespace; most values are
+        # already clean, so only the ones that need it go through the regex
+        for column in df.columns:
+            values = df[column].astype(str).str.strip()
+            messy = values.str.contains(_WS_MESSY_RE)
+            if messy.any():
+                values[messy] = values[messy].str.replace(_WS_RE, ' ', regex=True)
+            df[column] = values
         
-        # Ensure SKU is not just whitespace
-        normalized['sku'] = normalized['sku'].strip()
-        if not normalized['sku']:
-            raise ValueError("SKU cannot be empty or contain only whitespace")
+        # Validate required fields - must have actual values, not empty strings
+        missing_sku = df['sku'] == ''
+        missing_name = df['name'] == ''
+        invalid = missing_sku | missing_name
         
-        # Set defaults for optional fields
-        if 'description' not in normalized or not normalized['description']:
-            normalized['description'] = ''
+        if invalid.any():
+            for row_number, sku_missing in zip(df.index[invalid], missing_sku[invalid]):
+                error = (
+                    "SKU is required and cannot be empty" if sku_missing
+                    else "Name is required and cannot be empty"
+                )
+                self.record_error(int(row_number) + 1, error)
+            
+            invalid_count = int(invalid.sum())
+            self.stats['errors'] += invalid_count
+            self.stats['skipped'] += invalid_count
+            logger.warning(f"Skipped {invalid_count} invalid rows in this chunk")
+            df = df[~invalid]
         
-        # Truncate if necessary (database limits)
-        normalized['sku'] = normalized['sku'][:255]
-        normalized['name'] = normalized['name'][:500].strip()
+        # Truncate if necessary (database limits), then strip again so a cut
+        # can't leave a trailing space that lower(btrim(sku)) would ignore
         # description is TextField, no truncation needed
-        
-        return normalized
+        sku = df['sku'].str[:255].str.rstrip()
+        return df.assign(
+            sku=sku,
+            sku_lower=sku.str.lower(),
+            name=df['name'].str[:500].str.strip(),
+        )
     
-    def process_chunk(self, rows: List[Dict[str, str]]) -> None:
+    def process_chunk(self, df: pd.DataFrame) -> None:
         """
         Process a chunk of rows with bulk operations
         
         Args:
-            rows: List of row dictionaries
+            df: DataFrame of raw row data
         """
-        if not rows:
+        if df.empty:
             return
         
-        # Normalize all rows
-        normalized_rows = []
-        for idx, row in enumerate(rows):
-            try:
-                normalized = self.normalize_row(row)
-                normalized_rows.append(normalized)
-            except Exception as e:
-                self.stats['errors'] += 1
-                self.stats['skipped'] += 1
-                self.upload_job.add_error(
-                    self.stats['processed'] + idx + 1,
-                    str(e)
-                )
-                logger.warning(f"Row {idx + 1} error: {e}")
+        valid_rows = self.normalize_chunk(df)
         
-        if not normalized_rows:
+        if valid_rows.empty:
+            logger.warning("No valid rows in chunk after normalization")
             return
         
-        # Get all SKUs (lowercase) from this chunk - filter out empty SKUs
-        skus_lower = []
-        valid_rows = []
-        for row in normalized_rows:
-            sku = row.get('sku', '').strip()
-            if sku:  # Only include rows with non-empty SKUs
-                skus_lower.append(sku.lower())
-                valid_rows.append(row)
+        # Deduplicate SKUs within the chunk, keeping the last occurrence;
+        # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement
+        unique_rows = valid_rows.drop_duplicates(subset='sku_lower', keep='last')
+        duplicates = len(valid_rows) - len(unique_rows)
+        if duplicates:
+            self.stats['skipped'] += duplicates
+            logger.info(f"Skipped {duplicates} duplicate SKUs in this chunk")
+        
+        # Write rows in key order so concurrent chunks lock conflicting
+        # rows in the same order instead of deadlocking in ON CONFLICT
+        unique_rows = unique_rows.sort_values('sku_lower', kind='stable')
+        
+        # Build one list; existing SKUs are updated by the upsert itself
+        # sku_lower is a generated column, computed by the database on insert
+        # Plain tuples (name=None) skip the per-row namedtuple allocation
+        products = [
+            Product(
+                sku=sku,
+                name=name,
+                description=description,
+                is_active=True
+            )
+            for sku, name, description in unique_rows[self.CHUNK_COLUMNS].itertuples(index=False, name=None)
+        ]
+        # 1-based data row of each product, for errors on individual rows
+        row_numbers = (unique_rows.index + 1).tolist()
+        
+        # Keys not yet in the table are the ones the upsert creates;
+        # this is a unique-index lookup rather than a table COUNT(*)
+        existing_skus = set(
+            Product.objects.filter(sku_lower__in=unique_rows['sku_lower'].tolist())
+            .values_list('sku_lower', flat=True)
+        )
+        
+        # One transaction per chunk; the COPY and bisect retries nest as savepoints
+        with transaction.atomic():
+            self._relax_commit_durability()
+            if not existing_skus and self._can_copy():
+                # Pure-create chunk on a large import: stream it through COPY
+                try:
+                    with transaction.atomic():
+                        self._copy_products(products)
+                    written = products
+                except IntegrityError as e:
+                    # Usually a concurrent writer inserted one of these SKUs; the
+                    # upsert handles that and records any row that is really invalid
+                    logger.info(f"COPY of {len(products)} products failed, falling back to upsert: {e}")
+                    written = self._bulk_create_or_bisect(products, row_numbers)
             else:
-                # This should not happen due to normalize_row validation, but safety check
+                written = self._bulk_create_or_bisect(products, row_numbers)
+        
+        # Update stats with actual counts; when every row was written the
+        # split is known from the probe without lowercasing SKUs again
+        if len(written) == len(products):
+            updated_count = len(existing_skus)
+        else:
+            updated_count = sum(1 for product in written if product.sku.lower() in existing_skus)
+        self.stats['created'] += len(written) - updated_count
+        self.stats['updated'] += updated_count
+    
+    def _bulk_create_or_bisect(self, products: List[Product], row_numbers: List[int]) -> List[Product]:
+        """
+        Upsert products, splitting the batch in half on failure
+        A single bad row costs O(log N) retries instead of N single-row saves
+        
+        Args:
+            products: List of unsaved Product instances
+            row_numbers: 1-based data row number of each product
+            
+        Returns:
+            List of products that were written
+        """
+        try:
+            with transaction.atomic():
+                self.upsert_products(products)
+            return products
+        except (IntegrityError, DataError, ProgrammingError) as e:
+            # Two SKUs the chunk's dedup kept apart can still share a
+            # lower(btrim(sku)) key (Postgres and Python case mapping differ),
+            # which fails the whole ON CONFLICT DO UPDATE statement
+            if isinstance(e, ProgrammingError) and getattr(e.__cause__, 'pgcode', None) != _CARDINALITY_VIOLATION:
+                raise
+            if len(products) == 1:
+                product = products[0]
                 self.stats['errors'] += 1
                 self.stats['skipped'] += 1
-                logger.warning("Skipped row with empty SKU")
+                logger.warning(f"Failed to create product {product.sku}: {e}")
+                self.record_error(
+                    row_numbers[0],
+                    f"SKU {product.sku}: {str(e)}"
+                )
+                return []
+            
+            logger.info(f"Bulk upsert of {len(products)} products failed, retrying in halves: {e}")
+            middle = len(products) // 2
+            return (
+                self._bulk_create_or_bisect(products[:middle], row_numbers[:middle])
+                + self._bulk_create_or_bisect(products[middle:], row_numbers[middle:])
+            )
+    
+    def upsert_products(self, products: List[Product]) -> None:
+        """
+        Insert products, updating existing ones matched on sku_lower
+        Issues a single INSERT ... ON CONFLICT (sku_lower) DO UPDATE
         
-        if not valid_rows:
-            logger.warning("No valid rows in chunk after filtering empty SKUs")
+        Args:
+            products: List of unsaved Product instances
+        """
+        if connection.vendor == 'postgresql':
+            self._execute_values_upsert(products)
             return
         
-        # Find existing products
-        existing_products = Product.objects.filter(
-            sku_lower__in=skus_lower
-        ).in_bulk(field_name='sku_lower')
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku_lower'],
+            update_fields=self.UPSERT_FIELDS,
+            batch_size=self.CHUNK_SIZE
+        )
+    
+    def _execute_values_upsert(self, products: List[Product]) -> None:
+        """
+        Upsert products on Postgres with psycopg2's execute_values
+        Rows are rendered into one VALUES list client-side, skipping the ORM's
+        per-object SQL compilation and parameter list building
         
-        products_to_create = []
-        products_to_update = []
+        Args:
+            products: List of unsaved Product instances
+        """
+        from psycopg2.extras import execute_values
         
-        for row in valid_rows:
-            sku_lower = row['sku'].lower()
-            
-            if sku_lower in existing_products:
-                # Update existing product
-                product = existing_products[sku_lower]
-                product.sku = row['sku']  # Keep original case
-                product.sku_lower = row['sku'].lower().strip()  # Update sku_lower too
-                product.name = row['name']
-                product.description = row.get('description', '')
-                products_to_update.append(product)
+        now = timezone.now()
+        updates = ', '.join(f"{field} = EXCLUDED.{field}" for field in self.UPSERT_FIELDS)
+        sql = (
+            f"INSERT INTO {Product._meta.db_table} "
+            "(sku, name, description, is_active, created_at, updated_at) "
+            f"VALUES %s ON CONFLICT (sku_lower) DO UPDATE SET {updates}"
+        )
+        
+        # The raw psycopg2 cursor skips Django's error wrapping, which the
+        # bisect relies on to catch IntegrityError and friends
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            execute_values(
+                cursor.cursor,
+                sql,
+                [
+                    (product.sku, product.name, product.description, True, now, now)
+                    for product in products
+                ],
+                page_size=self.CHUNK_SIZE
+            )
+    
+    def _relax_commit_durability(self) -> None:
+        """
+        Let the current chunk transaction commit without waiting for the WAL flush
+        Chunks are idempotent upserts, so a crash at worst loses chunks
+        that a re-run of the same file writes again
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL synchronous_commit TO OFF")
+    
+    def _can_copy(self) -> bool:
+        """Whether new products may be bulk-loaded with COPY FROM STDIN"""
+        return (
+            connection.vendor == 'postgresql'
+            and self.upload_job.total_rows > self.COPY_THRESHOLD
+        )
+    
+    def _copy_products(self, products: List[Product]) -> None:
+        """
+        Load new products with Postgres COPY FROM STDIN
+        Skips per-row parameter binding; only valid when none of the SKUs exist
+        
+        Args:
+            products: List of unsaved Product instances
+        """
+        now = timezone.now()
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (product.sku, product.name, product.description, True, now, now)
+            for product in products
+        )
+        buffer.seek(0)
+        
+        # copy_expert isn't wrapped by Django, so its errors wouldn't be the
+        # IntegrityError the caller falls back on
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.copy_expert(
+                f"COPY {Product._meta.db_table} "
+                "(sku, name, description, is_active, created_at, updated_at) "
+                # Unquoted empty fields are NULL in CSV COPY; these columns are NOT NULL
+                "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (sku, name, description))",
+                buffer
+            )
+    
+    def count_rows(self) -> int:
+        """
+        Count data rows by scanning the raw bytes for newlines
+        Much faster than parsing every row; quoted multi-line values
+        make this an upper bound rather than an exact count
+        
+        Returns:
+            Estimated number of data rows (excluding header)
+        """
+        size = os.path.getsize(self.file_path)
+        if not size:
+            return 0
+        
+        newlines = 0
+        with open(self.file_path, 'rb') as f:
+            if size <= self.MMAP_MAX_SIZE:
+                # Map the file and scan it in place, without read() calls
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for offset in range(0, size, self.COUNT_WINDOW):
+                        newlines += mm[offset:offset + self.COUNT_WINDOW].count(b'\n')
+                    last_byte = mm[-1:]
             else:
-                # Create new product
-                product = Product(
-                    sku=row['sku'],
-                    name=row['name'],
-                    description=row.get('description', ''),
-                    is_active=True
+                for buf in iter(lambda: f.read(self.COUNT_WINDOW), b''):
+                    newlines += buf.count(b'\n')
+                    last_byte = buf[-1:]
+        
+        # Count a final line without trailing newline, then drop the header
+        if last_byte != b'\n':
+            newlines += 1
+        return max(newlines - 1, 0)
+    
+    def record_error(self, row_number: int, error_message: str) -> None:
+        """
+        Buffer a row error until the next progress update
+        
+        Args:
+            row_number: 1-based data row number (0 for job-level errors)
+            error_message: Description of the error
+        """
+        self._pending_errors.append({
+            'row': row_number,
+            'error': str(error_message)
+        })
+    
+    def _flush_pending_errors(self) -> None:
+        """Insert buffered row errors in a single bulk INSERT"""
+        if self._pending_errors:
+            UploadJobError.objects.bulk_create([
+                UploadJobError(
+                    upload_job=self.upload_job,
+                    row_number=error['row'],
+                    error=error['error']
                 )
-                # IMPORTANT: bulk_create doesn't call save(), so set sku_lower manually
-                product.sku_lower = row['sku'].lower().strip()
-                products_to_create.append(product)
+                for error in self._pending_errors
+            ])
+            self._pending_errors = []
+    
+    def update_progress(self, force: bool = False):
+        """
+        Update job progress in cache, and in the database at most every
+        PROGRESS_FLUSH_INTERVAL seconds
         
-        # Bulk operations
-        created_count = 0
-        updated_count = 0
+        Args:
+            force: Write to the database regardless of the interval
+        """
+        now = time.monotonic()
+        if force or now - self._last_db_flush >= self.PROGRESS_FLUSH_INTERVAL:
+            self._flush_pending_errors()
+            self.upload_job.processed_rows = self.stats['processed']
+            self.upload_job.success_count = self.stats['created'] + self.stats['updated']
+            self.upload_job.error_count = self.stats['errors']
+            self.upload_job.created_count = self.stats['created']
+            self.upload_job.updated_count = self.stats['updated']
+            self.upload_job.skipped_count = self.stats['skipped']
+            self.upload_job.save(update_fields=[
+                'processed_rows', 'success_count', 'error_count',
+                'created_count', 'updated_count', 'skipped_count'
+            ])
+            self._last_db_flush = now
         
+        self._cache_progress()
+    
+    @property
+    def progress_percentage(self) -> int:
+        """Progress of this import, independent of the last database write"""
+        if not self.stats['total']:
+            return 0
+        return min(int((self.stats['processed'] / self.stats['total']) * 100), 100)
+    
+    def _cache_progress(self):
+        """Write real-time progress and status to cache in one round-trip"""
+        # set_many is pipelined by django-redis
+        cache.set_many(
+            {
+                f'upload_job_{self.upload_job.id}_progress': {
+                    'processed': self.stats['processed'],
+                    'total': self.stats['total'],
+                    'percentage': self.progress_percentage,
+                    'status': self.upload_job.status,
+                    'created': self.stats['created'],
+                    'updated': self.stats['updated'],
+                    'errors': self.stats['errors'],
+                },
+                f'upload_job_{self.upload_job.id}_status': self.upload_job.status,
+            },
+            timeout=3600  # 1 hour
+        )
+        self._publish_progress()
+    
+    def _publish_progress(self):
+        """Push progress to SSE subscribers of this job"""
+        publish_upload_progress(self.upload_job.id, {
+            'status': self.upload_job.status,
+            'progress_percentage': self.progress_percentage,
+            'total_rows': self.stats['total'],
+            'processed_rows': self.stats['processed'],
+            'created_count': self.stats['created'],
+            'updated_count': self.stats['updated'],
+            'skipped_count': self.stats['skipped'],
+            'error_count': self.stats['errors'],
+        })
+    
+    def start(self) -> None:
+        """Mark the job as processing and record the estimated row count"""
+        self.upload_job.mark_as_processing()
+        
+        # Estimate total rows from a raw newline count (for progress tracking)
+        row_count = self.count_rows()
+        self.stats['total'] = row_count
+        self.upload_job.total_rows = row_count
+        self.upload_job.save(update_fields=['total_rows'])
+        logger.info(f"Estimated rows to process: {row_count}")
+    
+    def read_headers(self) -> List[str]:
+        """
+        Read and validate the header line
+        
+        Returns:
+            Lowercased column names
+        """
         try:
-            with transaction.atomic():
-                if products_to_create:
-                    # For accurate counting, we need to check what actually gets created
-                    # Get count before
-                    before_count = Product.objects.count()
-                    
-                    Product.objects.bulk_create(
-                        products_to_create,
-                        ignore_conflicts=self.skip_duplicates
-                    )
-                    
-                    # Get count after to see how many were actually created
-                    after_count = Product.objects.count()
-                    created_count = after_count - before_count
-                    
-                    # Track skipped duplicates
-                    skipped = len(products_to_create) - created_count
-                    if skipped > 0:
-                        self.stats['skipped'] += skipped
-                        logger.info(f"Skipped {skipped} duplicate SKUs in this chunk")
-                
-                if products_to_update:
-                    Product.objects.bulk_update(
-                        products_to_update,
-                        ['sku', 'name', 'description', 'sku_lower'],
-                        batch_size=500
-                    )
-                    updated_count = len(products_to_update)
+            headers = list(pd.read_csv(self.file_path, nrows=0, encoding='utf-8-sig').columns)
+        except pd.errors.EmptyDataError:
+            raise ValueError("CSV file is empty")
+        
+        is_valid, error_msg = self.validate_headers(headers)
+        if not is_valid:
+            raise ValueError(error_msg)
+        
+        return [h.lower().strip() for h in headers]
+    
+    def _read_csv(self, source, names: List[str], **kwargs):
+        """
+        Parse CSV rows as strings with pandas' C parser
+        The header line is parsed as row 0, with one column more than the
+        header: a row with one extra field fills OVERFLOW_COLUMN, and the
+        parser skips longer rows with a ParserWarning. Blank lines are kept
+        so row positions match the parser's line numbers
+        
+        Args:
+            source: Binary file object positioned at the header line
+            names: Column names from the header
+            **kwargs: Extra pandas.read_csv arguments
             
-            # Update stats with actual counts
-            self.stats['created'] += created_count
-            self.stats['updated'] += updated_count
+        Returns:
+            DataFrame, or a chunk reader when chunksize is given
+        """
+        return pd.read_csv(
+            source,
+            encoding='utf-8-sig',
+            names=names + [self.OVERFLOW_COLUMN],
+            header=None,
+            index_col=False,
+            dtype=str,
+            na_filter=False,
+            on_bad_lines='warn',
+            skip_blank_lines=False,
+            **kwargs
+        )
+    
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Validate headers and yield the CSV in chunks
+        Parsing happens in C with pandas; only one chunk is held in memory
+        
+        Yields:
+            DataFrame of up to CHUNK_SIZE raw rows, indexed by data row position
+        """
+        names = self.read_headers()
+        
+        # Large buffer means fewer read() syscalls on multi-GB files
+        with open(self.file_path, 'rb', buffering=self.READ_BUFFER_SIZE) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
             
-        except Exception as e:
-            logger.error(f"Bulk operation error: {e}")
-            # Try to save products individually to identify problematic rows
-            if products_to_create:
-                for product in products_to_create:
+            with self._read_csv(f, names, chunksize=self.CHUNK_SIZE) as reader:
+                skipped = 0
+                while True:
                     try:
-                        product.save()
-                        self.stats['created'] += 1
-                    except Exception as individual_error:
-                        self.stats['errors'] += 1
-                        self.stats['skipped'] += 1
-                        logger.warning(f"Failed to create product {product.sku}: {individual_error}")
-                        self.upload_job.add_error(
-                            self.stats['processed'],
-                            f"SKU {product.sku}: {str(individual_error)}"
+                        chunk_df, chunk_skipped = self._read_valid_rows(
+                            reader.__next__, first_row=0, skipped_before=skipped
                         )
+                    except StopIteration:
+                        return
+                    skipped += chunk_skipped
+                    if not chunk_df.empty:
+                        yield chunk_df
     
-    def update_progress(self):
-        """Update job progress in database and cache"""
-        self.upload_job.processed_rows = self.stats['processed']
-        self.upload_job.success_count = self.stats['created'] + self.stats['updated']
-        self.upload_job.error_count = self.stats['errors']
-        self.upload_job.created_count = self.stats['created']
-        self.upload_job.updated_count = self.stats['updated']
-        self.upload_job.skipped_count = self.stats['skipped']
-        self.upload_job.save(update_fields=[
-            'processed_rows', 'success_count', 'error_count',
-            'created_count', 'updated_count', 'skipped_count'
-        ])
-        
-        # Update cache for real-time progress
-        cache.set(
-            f'upload_job_{self.upload_job.id}_progress',
-            {
-                'processed': self.stats['processed'],
-                'total': self.stats['total'],
-                'percentage': self.upload_job.progress_percentage,
-                'status': self.upload_job.status,
-                'created': self.stats['created'],
-                'updated': self.stats['updated'],
-                'errors': self.stats['errors'],
-            },
-            timeout=3600  # 1 hour
+    def iter_chunk_ranges(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Split the data rows into chunks of CHUNK_SIZE rows by byte range
+        Parallel subtasks read their own slice of the file, so rows never
+        go through the broker. Rows are delimited by the csv module's
+        tokenizer, which consumes exactly one row's lines per record
+        
+        Yields:
+            Tuple of (first data row position, start byte, end byte)
+        """
+        self.read_headers()
+        # Values as long as pandas accepts (the default limit is 128KB)
+        csv.field_size_limit(max(csv.field_size_limit(), 2 ** 31 - 1))
+        
+        with open(self.file_path, 'rb', buffering=self.READ_BUFFER_SIZE) as f:
+            offset = len(f.readline())
+            
+            def lines():
+                nonlocal offset
+                for line in f:
+                    offset += len(line)
+                    # Delimiters, quotes and newlines are ASCII, so latin-1
+                    # splits UTF-8 rows the same way without decoding errors
+                    yield line.decode('latin-1')
+            
+            start = offset
+            start_row = row = 0
+            for _ in csv.reader(lines()):
+                row += 1
+                if row - start_row == self.CHUNK_SIZE:
+                    yield start_row, start, offset
+                    start, start_row = offset, row
+            
+            if row > start_row:
+                yield start_row, start, offset
+    
+    def read_chunk(self, start_row: int, start: int, end: int) -> pd.DataFrame:
+        """
+        Read one chunk of a parallel import from its byte range
+        
+        Args:
+            start_row: Data row position of the first row in the range
+            start: Offset of the range's first byte
+            end: Offset just past the range's last byte
+            
+        Returns:
+            DataFrame of the range's raw rows, indexed by data row position
+        """
+        names = self.read_headers()
+        
+        # Parse the range behind the header line, as a sequential read would
+        with open(self.file_path, 'rb') as f:
+            data = f.readline()
+            f.seek(start)
+            data += f.read(end - start)
+        
+        df, _ = self._read_valid_rows(
+            lambda: self._read_csv(io.BytesIO(data), names),
+            first_row=start_row
         )
+        return df
+    
+    def _read_valid_rows(self, read, first_row: int, skipped_before: int = 0) -> Tuple[pd.DataFrame, int]:
+        """
+        Run a _read_csv read and record its malformed rows as row errors
+        Rows the parser skipped are only reported in a ParserWarning; the
+        rows after them are renumbered so positions still match the file
+        
+        Args:
+            read: Callable doing the read and returning a DataFrame
+            first_row: Data row position of the first row after the header line
+            skipped_before: Rows skipped by earlier reads of the same parser
+            
+        Returns:
+            Tuple of (DataFrame of data rows indexed by position, number of rows the parser skipped)
+        """
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.ParserWarning)
+            df = read()
+        
+        expected = len(df.columns) - 1
+        # The header line is row 0 and line 1 of the warnings
+        index = df.index + (first_row - 1 + skipped_before)
+        malformed = []
+        for warning in caught:
+            if not issubclass(warning.category, pd.errors.ParserWarning):
+                warnings.warn_explicit(
+                    warning.message, warning.category, warning.filename, warning.lineno
+                )
+                continue
+            for line in _BAD_LINE_RE.findall(str(warning.message)):
+                row_number = first_row + int(line) - 2
+                malformed.append(row_number)
+                index = index.where(index < row_number, index + 1)
+        skipped = len(malformed)
+        
+        df.index = index
+        overflow = df.pop(self.OVERFLOW_COLUMN).to_numpy() != ''
+        malformed.extend(index[overflow])
+        
+        if malformed:
+            for row_number in sorted(malformed):
+                self.record_error(int(row_number) + 1, f"Malformed row: more than {expected} fields")
+            self.stats['processed'] += len(malformed)
+            self.stats['errors'] += len(malformed)
+            self.stats['skipped'] += len(malformed)
+            logger.warning(f"Skipped {len(malformed)} malformed rows in this chunk")
+        
+        # Drop the header line, malformed rows and blank lines; only rows
+        # with an empty first value can be blank, so only those are checked
+        drop = overflow | (index < first_row)
+        empty_first = df.iloc[:, 0].to_numpy() == ''
+        if empty_first.any():
+            drop[empty_first] |= (df[empty_first] == '').all(axis=1).to_numpy()
+        return (df[~drop] if drop.any() else df), skipped
+    
+    def import_chunk(self, start_row: int, start: int, end: int) -> Dict:
+        """
+        Process one chunk dispatched by a parallel import
+        Job counters are incremented atomically since chunks run concurrently
+        
+        Args:
+            start_row: Data row position of the first row in the chunk
+            start: Offset of the chunk's first byte in the file
+            end: Offset just past the chunk's last byte
+            
+        Returns:
+            Dictionary with this chunk's statistics and buffered errors
+        """
+        df = self.read_chunk(start_row, start, end)
+        self.process_chunk(df)
+        self.stats['processed'] += len(df)
+        
+        UploadJob.objects.filter(pk=self.upload_job.pk).update(
+            processed_rows=F('processed_rows') + self.stats['processed'],
+            success_count=F('success_count') + self.stats['created'] + self.stats['updated'],
+            error_count=F('error_count') + self.stats['errors'],
+            created_count=F('created_count') + self.stats['created'],
+            updated_count=F('updated_count') + self.stats['updated'],
+            skipped_count=F('skipped_count') + self.stats['skipped'],
+        )
+        
+        return {'stats': self.stats, 'errors': self._pending_errors}
+    
+    def complete_from_chunks(self, results: List[Dict]) -> Dict[str, int]:
+        """
+        Merge the results of a parallel import and mark the job completed
+        
+        Args:
+            results: Return values of import_chunk, one per chunk
+            
+        Returns:
+            Dictionary with import statistics
+        """
+        for result in results:
+            for key in ('processed', 'created', 'updated', 'skipped', 'errors'):
+                self.stats[key] += result['stats'][key]
+            self._pending_errors.extend(result['errors'])
+        
+        self._pending_errors.sort(key=lambda error: error['row'])
+        self.complete()
+        return self.stats
+    
+    def complete(self) -> None:
+        """Mark the job completed with the exact row count"""
+        # Multi-line values make the newline count an upper bound,
+        # so persist the exact row count once processing is done
+        self.stats['total'] = self.stats['processed']
+        self.update_progress(force=True)
+        self.upload_job.mark_as_completed(total_rows=self.stats['processed'])
+        self._cache_progress()
+        logger.info(
+            f"Import completed successfully! "
+            f"Total: {self.stats['processed']:,} rows, "
+            f"Created: {self.stats['created']:,}, "
+            f"Updated: {self.stats['updated']:,}, "
+            f"Errors: {self.stats['errors']:,}"
+        )
+    
+    def fail(self, error: Exception) -> None:
+        """Mark the job failed, keeping any buffered row errors"""
+        logger.error(f"Import failed: {error}")
+        self._flush_pending_errors()
+        self.upload_job.mark_as_failed(str(error))
+        self._publish_progress()
     
     def import_csv(self) -> Dict[str, int]:
         """
@@ -277,69 +759,27 @@ class CSVImporter:
             Dictionary with import statistics
         """
         try:
-            self.upload_job.mark_as_processing()
-            
-            # First pass: count total rows (for progress tracking)
-            logger.info("Counting total rows in CSV...")
-            with open(self.file_path, 'r', encoding='utf-8-sig', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                # Validate headers
-                if reader.fieldnames:
-                    is_valid, error_msg = self.validate_headers(reader.fieldnames)
-                    if not is_valid:
-                        raise ValueError(error_msg)
-                
-                # Count rows efficiently
-                row_count = sum(1 for _ in reader)
-                self.stats['total'] = row_count
-                self.upload_job.total_rows = row_count
-                self.upload_job.save(update_fields=['total_rows'])
-                logger.info(f"Total rows to process: {row_count}")
+            self.start()
             
-            # Second pass: process in chunks (memory efficient)
+            # Single pass: process in chunks (memory efficient)
             logger.info("Starting CSV processing...")
-            with open(self.file_path, 'r', encoding='utf-8-sig', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
+            for chunk_df in self.iter_chunks():
+                self.process_chunk(chunk_df)
+                self.stats['processed'] += len(chunk_df)
+                self.update_progress()
                 
-                chunk = []
-                for idx, row in enumerate(reader, start=1):
-                    chunk.append(row)
-                    self.stats['processed'] += 1
-                    
-                    # Process chunk when full
-                    if len(chunk) >= self.CHUNK_SIZE:
-                        self.process_chunk(chunk)
-                        chunk = []
-                        self.update_progress()
-                        
-                        # Log progress every 10,000 rows
-                        if idx % 10000 == 0:
-                            logger.info(
-                                f"Progress: {self.stats['processed']:,}/{self.stats['total']:,} rows "
-                                f"({self.upload_job.progress_percentage}%) - "
-                                f"Created: {self.stats['created']:,}, Updated: {self.stats['updated']:,}, "
-                                f"Errors: {self.stats['errors']:,}"
-                            )
-                
-                # Process remaining rows
-                if chunk:
-                    self.process_chunk(chunk)
-                    self.update_progress()
-            
-            self.upload_job.mark_as_completed()
-            logger.info(
-                f"Import completed successfully! "
-                f"Total: {self.stats['processed']:,} rows, "
-                f"Created: {self.stats['created']:,}, "
-                f"Updated: {self.stats['updated']:,}, "
-                f"Errors: {self.stats['errors']:,}"
-            )
+                # Log progress every 10,000 rows
+                if self.stats['processed'] % 10000 == 0:
+                    logger.info(
+                        f"Progress: {self.stats['processed']:,}/{self.stats['total']:,} rows "
+                        f"({self.progress_percentage}%) - "
+                        f"Created: {self.stats['created']:,}, Updated: {self.stats['updated']:,}, "
+                        f"Errors: {self.stats['errors']:,}"
+                    )
             
+            self.complete()
             return self.stats
             
         except Exception as e:
-            logger.error(f"Import failed: {e}")
-            self.upload_job.mark_as_failed(str(e))
+            self.fail(e)
             raise
-
@@ -0,0 +1,42 @@
+"""
+Upload Progress Service
+Publishes import progress over Redis pub/sub for the SSE endpoint
+"""
+
+import json
+import logging
+from typing import Dict
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+
+def get_redis() -> redis.Redis:
+    """Shared Redis client (connection pooled) for progress pub/sub"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def upload_progress_channel(upload_job_id: int) -> str:
+    """Pub/sub channel carrying progress updates for an upload job"""
+    return f'upload:{upload_job_id}'
+
+
+def publish_upload_progress(upload_job_id: int, data: Dict) -> None:
+    """
+    Publish a progress update to the job's channel
+    Failures are logged, never raised; subscribers fall back to the database
+    
+    Args:
+        upload_job_id: ID of the UploadJob
+        data: Progress payload, in the shape sent to SSE clients
+    """
+    try:
+        get_redis().publish(upload_progress_channel(upload_job_id), json.dumps(data))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to publish progress for job {upload_job_id}: {e}")
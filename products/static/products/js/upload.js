@@ -95,7 +95,6 @@ uploadForm.addEventListener('submit', async (e) => {
     // Create FormData
     const formData = new FormData();
     formData.append('csv_file', file);
-    formData.append('skip_duplicates', document.getElementById('skipDuplicates').checked);
     formData.append('deactivate_missing', document.getElementById('deactivateMissing').checked);
     
     try {
@@ -3,13 +3,16 @@ Celery tasks for product operations
 """
 
 import logging
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+BULK_DELETE_BATCH_SIZE = 5000  # Products removed per DELETE statement
+
 
 @shared_task(bind=True, max_retries=3)
 def process_csv_import(self, upload_job_id, options=None):
@@ -18,12 +21,11 @@ def process_csv_import(self, upload_job_id, options=None):
     
     Args:
         upload_job_id: ID of the UploadJob
-        options: Optional dictionary with import options (skip_duplicates, deactivate_missing)
+        options: Optional dictionary with import options (parallel, deactivate_missing)
         
     Returns:
         Dictionary with import statistics
     """
-    from products.models import UploadJob
     from products.services.csv_importer import CSVImporter
     
     if options is None:
@@ -32,13 +34,29 @@ def process_csv_import(self, upload_job_id, options=None):
     try:
         logger.info(f"Starting CSV import for job {upload_job_id} with options: {options}")
         
-        # Update task ID in upload job
-        upload_job = UploadJob.objects.get(id=upload_job_id)
-        upload_job.task_id = self.request.id
-        upload_job.save(update_fields=['task_id'])
-        
-        # Create importer and process
+        # Create importer and process (upload_csv records the task ID)
         importer = CSVImporter(upload_job_id, options=options)
+        
+        if options.get('parallel', settings.CSV_IMPORT_PARALLEL):
+            # Fan chunks out to subtasks; the chord callback completes the job
+            try:
+                importer.start()
+                chunk_tasks = [
+                    process_csv_chunk.s(upload_job_id, start_row, start, end, options)
+                    for start_row, start, end in importer.iter_chunk_ranges()
+                ]
+            except Exception as e:
+                importer.fail(e)
+                raise
+            
+            callback = finalize_csv_import.s(upload_job_id).on_error(
+                fail_csv_import.s(upload_job_id)
+            )
+            chord(chunk_tasks)(callback)
+            
+            logger.info(f"Dispatched {len(chunk_tasks)} chunks for job {upload_job_id}")
+            return {'chunks': len(chunk_tasks)}
+        
         stats = importer.import_csv()
         
         logger.info(f"CSV import completed for job {upload_job_id}: {stats}")
@@ -46,7 +64,7 @@ def process_csv_import(self, upload_job_id, options=None):
         # Trigger webhook
         trigger_webhooks.delay('upload.completed', {
             'upload_job_id': upload_job_id,
-            'file_name': upload_job.file_name,
+            'file_name': importer.upload_job.file_name,
             'stats': stats
         })
         
@@ -67,6 +85,81 @@ def process_csv_import(self, upload_job_id, options=None):
         raise
 
 
+@shared_task
+def process_csv_chunk(upload_job_id, start_row, start, end, options=None):
+    """
+    Process one chunk of a parallel CSV import
+    The chunk is read from the uploaded file on the shared media volume
+    
+    Args:
+        upload_job_id: ID of the UploadJob
+        start_row: Data row position of the first row in the chunk
+        start: Offset of the chunk's first byte in the file
+        end: Offset just past the chunk's last byte
+        options: Optional dictionary with import options
+        
+    Returns:
+        Dictionary with the chunk's statistics and errors
+    """
+    from products.services.csv_importer import CSVImporter
+    
+    importer = CSVImporter(upload_job_id, options=options)
+    return importer.import_chunk(start_row, start, end)
+
+
+@shared_task
+def finalize_csv_import(results, upload_job_id):
+    """
+    Chord callback: merge chunk results and complete the import
+    
+    Args:
+        results: List of process_csv_chunk return values
+        upload_job_id: ID of the UploadJob
+        
+    Returns:
+        Dictionary with import statistics
+    """
+    from products.services.csv_importer import CSVImporter
+    
+    importer = CSVImporter(upload_job_id)
+    stats = importer.complete_from_chunks(results)
+    
+    logger.info(f"CSV import completed for job {upload_job_id}: {stats}")
+    
+    # Trigger webhook
+    trigger_webhooks.delay('upload.completed', {
+        'upload_job_id': upload_job_id,
+        'file_name': importer.upload_job.file_name,
+        'stats': stats
+    })
+    
+    return stats
+
+
+@shared_task
+def fail_csv_import(request, exc, traceback, upload_job_id):
+    """
+    Chord error callback: mark a parallel import as failed
+    
+    Args:
+        request: Request context of the failed task
+        exc: Exception raised by the failed task
+        traceback: Traceback of the failure
+        upload_job_id: ID of the UploadJob
+    """
+    from products.models import UploadJob
+    from products.services.progress import publish_upload_progress
+    
+    logger.error(f"CSV import failed for job {upload_job_id}: {exc}")
+    UploadJob.objects.get(id=upload_job_id).mark_as_failed(str(exc))
+    publish_upload_progress(upload_job_id, {'status': 'failed'})
+    
+    trigger_webhooks.delay('upload.failed', {
+        'upload_job_id': upload_job_id,
+        'error': str(exc)
+    })
+
+
 @shared_task
 def bulk_delete_products(product_ids):
     """
@@ -79,16 +172,34 @@ def bulk_delete_products(product_ids):
         Number of products deleted
     """
     from products.models import Product, AuditLog
+    from django.db import connection
     
     try:
         logger.info(f"Starting bulk delete of {len(product_ids)} products")
         
-        # Get products to delete
-        products = Product.objects.filter(id__in=product_ids)
-        count = products.count()
-        
-        # Get SKUs for audit log
-        skus = list(products.values_list('sku', flat=True))
+        # Delete in batches to bound the IN list and each transaction's lock time;
+        # nothing references Product by foreign key, so a raw DELETE is enough
+        count = 0
+        skus = []  # SKUs for audit log (limit to first 100 for storage)
+        for i in range(0, len(product_ids), BULK_DELETE_BATCH_SIZE):
+            batch = product_ids[i:i + BULK_DELETE_BATCH_SIZE]
+            
+            if connection.vendor == 'postgresql':
+                # Delete and collect SKUs in one round-trip; ids arrive as
+                # strings from the list page, which would bind as text[]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {Product._meta.db_table} WHERE id = ANY(%s) RETURNING sku",
+                        [[int(product_id) for product_id in batch]]
+                    )
+                    deleted_skus = [row[0] for row in cursor.fetchall()]
+                count += len(deleted_skus)
+            else:
+                products = Product.objects.filter(id__in=batch)
+                deleted_skus = list(products.values_list('sku', flat=True)[:100 - len(skus)])
+                count += products._raw_delete(products.db)
+            
+            skus.extend(deleted_skus[:100 - len(skus)])
         
         # Create audit log
         AuditLog.objects.create(
@@ -97,14 +208,11 @@ def bulk_delete_products(product_ids):
             changes={
                 'deleted_count': count,
                 'product_ids': product_ids,
-                'skus': skus[:100]  # Limit to first 100 for storage
+                'skus': skus
             },
             user='system'
         )
         
-        # Delete products
-        products.delete()
-        
         logger.info(f"Bulk delete completed: {count} products deleted")
         
         # Trigger webhook
@@ -122,15 +230,16 @@ def bulk_delete_products(product_ids):
 @shared_task
 def cleanup_old_upload_jobs(days=30):
     """
-    Clean up old upload jobs (keep records but delete files)
+    Delete old finished upload jobs along with their files and row errors
     
     Args:
         days: Number of days to keep
         
     Returns:
-        Number of jobs cleaned
+        Number of jobs deleted
     """
-    from products.models import UploadJob
+    from products.models import UploadJob, UploadJobError
+    from django.db import transaction
     import os
     
     try:
@@ -141,15 +250,26 @@ def cleanup_old_upload_jobs(days=30):
             status__in=['completed', 'failed']
         )
         
-        count = 0
-        for job in old_jobs:
-            # Delete the file if it exists
-            if job.file_path and os.path.exists(job.file_path.path):
-                os.remove(job.file_path.path)
-                logger.info(f"Deleted file for job {job.id}")
-                count += 1
-        
-        logger.info(f"Cleanup completed: {count} files deleted")
+        storage = UploadJob.file_path.field.storage
+        file_paths = old_jobs.exclude(file_path='').values_list('file_path', flat=True)
+        
+        files = 0
+        for file_path in file_paths.iterator(chunk_size=500):
+            # Delete the file if it exists (one unlink instead of stat + remove)
+            try:
+                os.unlink(storage.path(file_path))
+            except FileNotFoundError:
+                continue
+            files += 1
+        
+        # _raw_delete skips the collector, which would load every row to cascade;
+        # the only dependent table is cleared explicitly first
+        with transaction.atomic():
+            errors = UploadJobError.objects.filter(upload_job__in=old_jobs)
+            errors._raw_delete(errors.db)
+            count = old_jobs._raw_delete(old_jobs.db)
+        
+        logger.info(f"Cleanup completed: {count} upload jobs and {files} files deleted")
         return count
         
     except Exception as e:
@@ -157,7 +277,7 @@ def cleanup_old_upload_jobs(days=30):
         raise
 
 
-@shared_task
+@shared_task(compression='gzip')
 def trigger_webhooks(event_type, payload):
     """
     Trigger webhooks for an event
@@ -166,21 +286,25 @@ def trigger_webhooks(event_type, payload):
         event_type: Type of event
         payload: Event payload data
     """
-    from webhooks.models import Webhook
-    from webhooks.tasks import send_webhook
+    from webhooks.services.webhook_service import get_active_webhook_ids
+    from webhooks.tasks import enqueue_webhooks
     
     try:
-        # Find active webhooks for this event type
-        webhooks = Webhook.objects.filter(
-            event_type=event_type,
-            is_active=True
-        )
-        
-        logger.info(f"Triggering {webhooks.count()} webhooks for event: {event_type}")
-        
-        # Trigger each webhook asynchronously
-        for webhook in webhooks:
-            send_webhook.delay(webhook.id, payload)
+        # Find active webhooks for this event type (cached per event type)
+        webhook_ids = get_active_webhook_ids(event_type)
+        
+        logger.info(f"Triggering {len(webhook_ids)} webhooks for event: {event_type}")
+        
+        if webhook_ids:
+            # Expand bulk product events with their SKUs, off the request path
+            if 'product_ids' in payload and 'skus' not in payload:
+                from products.models import Product
+                payload['skus'] = list(
+                    Product.objects.filter(id__in=payload['product_ids'])
+                    .values_list('sku', flat=True)[:100]  # Limit for payload size
+                )
+            
+            enqueue_webhooks(event_type, payload, webhook_ids)
         
     except Exception as e:
         logger.error(f"Failed to trigger webhooks: {e}")
@@ -196,16 +320,20 @@ def update_product_stats():
     from django.db.models import Count, Q
     
     try:
-        stats = {
-            'total_products': Product.objects.count(),
-            'active_products': Product.objects.filter(is_active=True).count(),
-            'inactive_products': Product.objects.filter(is_active=False).count(),
-            'total_uploads': UploadJob.objects.count(),
-            'pending_uploads': UploadJob.objects.filter(status='pending').count(),
-            'processing_uploads': UploadJob.objects.filter(status='processing').count(),
-            'completed_uploads': UploadJob.objects.filter(status='completed').count(),
-            'failed_uploads': UploadJob.objects.filter(status='failed').count(),
-        }
+        # One conditional aggregate per table instead of a COUNT per figure
+        product_stats = Product.objects.aggregate(
+            total_products=Count('id'),
+            active_products=Count('id', filter=Q(is_active=True)),
+            inactive_products=Count('id', filter=Q(is_active=False)),
+        )
+        upload_stats = UploadJob.objects.aggregate(
+            total_uploads=Count('id'),
+            pending_uploads=Count('id', filter=Q(status='pending')),
+            processing_uploads=Count('id', filter=Q(status='processing')),
+            completed_uploads=Count('id', filter=Q(status='completed')),
+            failed_uploads=Count('id', filter=Q(status='failed')),
+        )
+        stats = {**product_stats, **upload_stats}
         
         cache.set('product_stats', stats, timeout=300)  # 5 minutes
         logger.info("Product stats updated")
@@ -232,6 +360,7 @@ def export_products_csv(filters=None):
     import csv
     import os
     from django.conf import settings
+    from django.db import connection
     
     try:
         timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
@@ -241,25 +370,46 @@ def export_products_csv(filters=None):
         # Ensure directory exists
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
-        # Get products
-        products = Product.objects.all()
+        # Get products as plain tuples of the exported columns (no model instances)
+        products = Product.objects.values_list(
+            'sku', 'name', 'description', 'is_active', 'created_at'
+        )
         if filters:
             # Apply filters if provided
             pass
         
-        # Write CSV
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['SKU', 'Name', 'Description', 'Status', 'Created At'])
-            
-            for product in products.iterator(chunk_size=1000):
-                writer.writerow([
-                    product.sku,
-                    product.name,
-                    product.description,
-                    'Active' if product.is_active else 'Inactive',
-                    product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                ])
+        if connection.vendor == 'postgresql':
+            # Let Postgres format the CSV and stream it straight into the file
+            select_sql, params = products.query.sql_with_params()
+            with connection.cursor() as cursor, open(filepath, 'wb') as csvfile:
+                cursor.copy_expert(
+                    cursor.mogrify(
+                        "COPY (SELECT sku AS \"SKU\", name AS \"Name\", "
+                        "description AS \"Description\", "
+                        "CASE WHEN is_active THEN 'Active' ELSE 'Inactive' END AS \"Status\", "
+                        "to_char(created_at, 'YYYY-MM-DD HH24:MI:SS') AS \"Created At\" "
+                        f"FROM ({select_sql}) AS export) TO STDOUT WITH (FORMAT csv, HEADER)",
+                        params
+                    ),
+                    csvfile
+                )
+        else:
+            # Write CSV, streaming rows in chunks
+            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['SKU', 'Name', 'Description', 'Status', 'Created At'])
+                writer.writerows(
+                    (
+                        sku,
+                        name,
+                        description,
+                        'Active' if is_active else 'Inactive',
+                        # YYYY-MM-DD HH:MM:SS, without strftime's format parsing
+                        created_at.isoformat(sep=' ', timespec='seconds')[:19]
+                    )
+                    for sku, name, description, is_active, created_at
+                    in products.iterator(chunk_size=5000)
+                )
         
         logger.info(f"Export completed: {filepath}")
         return filepath
@@ -1,3 +1,289 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import pandas as pd
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from products.models import Product, UploadJob, UploadJobError
+from products.services.csv_importer import CSVImporter
+from products.tasks import bulk_delete_products, cleanup_old_upload_jobs
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY is only used on Postgres")
+class CopyImportTests(TestCase):
+    """CSV import chunks loaded with COPY FROM STDIN"""
+
+    def setUp(self):
+        # Large enough total for process_chunk to choose COPY
+        self.upload_job = UploadJob.objects.create(
+            file_name='products.csv',
+            file_path='uploads/products.csv',
+            total_rows=CSVImporter.COPY_THRESHOLD + 1
+        )
+        self.importer = CSVImporter(self.upload_job.id)
+
+    def test_copy_keeps_empty_description(self):
+        """An empty description is stored as '' rather than failing the NOT NULL column"""
+        self.importer._copy_products([
+            Product(sku='SKU-1', name='First', description=''),
+            Product(sku='SKU-2', name='Second', description='Has one'),
+        ])
+
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'description')),
+            {'SKU-1': '', 'SKU-2': 'Has one'}
+        )
+
+    def test_chunk_with_empty_description_is_copied(self):
+        """A new-products chunk goes through COPY without falling back to the upsert"""
+        df = pd.DataFrame({
+            'name': ['First', 'Second'],
+            'sku': ['SKU-1', 'SKU-2'],
+            'description': ['', 'Has one'],
+        })
+
+        with self.assertNoLogs('products.services.csv_importer', level='INFO'):
+            self.importer.process_chunk(df)
+
+        self.assertEqual(self.importer.stats['created'], 2)
+        self.assertEqual(self.importer.stats['errors'], 0)
+        self.assertEqual(Product.objects.get(sku='SKU-1').description, '')
+
+    def test_copy_conflict_falls_back_to_upsert(self):
+        """A SKU inserted since the existence probe is updated rather than failing the chunk"""
+        Product.objects.create(sku='SKU-1', name='Old')
+
+        with mock.patch.object(Product.objects, 'filter', return_value=Product.objects.none()):
+            self.importer.process_chunk(pd.DataFrame({
+                'name': ['First', 'Second'],
+                'sku': ['SKU-1', 'SKU-2'],
+                'description': ['', ''],
+            }))
+
+        self.assertEqual(self.importer.stats['errors'], 0)
+        self.assertEqual(
+            dict(Product.objects.values_list('sku', 'name')),
+            {'SKU-1': 'First', 'SKU-2': 'Second'}
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', "ON CONFLICT cardinality errors are Postgres-specific")
+class UpsertTests(TestCase):
+    """Chunk upserts keyed on the database's lower(btrim(sku))"""
+
+    def setUp(self):
+        self.upload_job = UploadJob.objects.create(file_name='products.csv', file_path='uploads/products.csv')
+        self.importer = CSVImporter(self.upload_job.id)
+
+    def test_truncated_sku_is_deduplicated_like_the_database(self):
+        """Cutting a SKU at 255 characters can't leave a trailing space behind"""
+        df = pd.DataFrame({
+            'name': ['First', 'Second'],
+            'sku': ['S' * 254 + ' tail', 'S' * 254],
+            'description': ['', ''],
+        })
+
+        self.importer.process_chunk(df)
+
+        self.assertEqual(self.importer.stats['errors'], 0)
+        self.assertEqual(self.importer.stats['skipped'], 1)
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Second'])
+
+    def test_keys_colliding_in_the_database_are_bisected(self):
+        """A chunk whose SKUs share a database key is split instead of failing"""
+        written = self.importer._bulk_create_or_bisect(
+            [Product(sku='SKU-1', name='First'), Product(sku='sku-1 ', name='Second')],
+            [1, 2]
+        )
+
+        self.assertEqual(len(written), 2)
+        self.assertEqual(self.importer.stats['errors'], 0)
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Second'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkRangeTests(TestCase):
+    """Byte ranges dispatched to parallel import chunks"""
+
+    def setUp(self):
+        self.upload_job = UploadJob(file_name='products.csv')
+        self.upload_job.file_path.save('products.csv', ContentFile(
+            b'\xef\xbb\xbfName,SKU,Description\n'
+            b'First,SKU-1,Plain\n'
+            b'Second,SKU-2,"Spans\nthree\nlines"\n'
+            b'\n'
+            b'Third,SKU-3,"Has ""quotes"", and a comma"\n'
+            b'Fourth,SKU-4,"Quoted\n""line"""\n'
+            b'Extra,SKU-X,Too,many\n'
+            b'Fifth,SKU-5,No trailing newline'
+        ))
+        self.importer = CSVImporter(self.upload_job.id)
+
+    def test_ranges_match_sequential_chunks(self):
+        """Reading every range gives the same rows and positions as one pass"""
+        with mock.patch.object(CSVImporter, 'CHUNK_SIZE', 2):
+            sequential = pd.concat(self.importer.iter_chunks())
+            ranges = list(self.importer.iter_chunk_ranges())
+            chunks = [self.importer.read_chunk(*chunk_range) for chunk_range in ranges]
+
+        self.assertEqual([start_row for start_row, start, end in ranges], [0, 2, 4, 6])
+        self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+        pd.testing.assert_frame_equal(pd.concat(chunks), sequential)
+        self.assertEqual(sequential['description'].iloc[1], 'Spans\nthree\nlines')
+        # Blank and malformed lines are skipped without renumbering the rows after them
+        self.assertEqual(sequential.index.tolist(), [0, 1, 3, 4, 6])
+
+    def test_unbalanced_quote_in_unquoted_value(self):
+        """A stray inch mark neither merges rows nor swallows the rest of the file"""
+        upload_job = UploadJob(file_name='monitors.csv')
+        upload_job.file_path.save('monitors.csv', ContentFile(
+            b'name,sku,description\n'
+            b'First,SKU-1,Plain\n'
+            b'Second,SKU-2,Plain\n'
+            b'Monitor,SKU-3,27" IPS\n'
+            b'Fourth,SKU-4,Plain\n'
+            b'Fifth,SKU-5,Plain\n'
+            b'Monitor,SKU-6,24" VA\n'
+            b'Seventh,SKU-7,Plain\n'
+        ))
+        importer = CSVImporter(upload_job.id)
+
+        with mock.patch.object(CSVImporter, 'CHUNK_SIZE', 2):
+            ranges = list(importer.iter_chunk_ranges())
+            chunks = [importer.read_chunk(*chunk_range) for chunk_range in ranges]
+
+        # 27" starts a chunk, 24" is in the middle of one
+        self.assertEqual([start_row for start_row, start, end in ranges], [0, 2, 4, 6])
+        rows = pd.concat(chunks)
+        self.assertEqual(rows.index.tolist(), list(range(7)))
+        self.assertEqual(rows['description'][2], '27" IPS')
+        self.assertEqual(rows['description'][5], '24" VA')
+
+    def test_import_chunk_reads_its_range(self):
+        """A subtask imports only the rows in its byte range"""
+        with mock.patch.object(CSVImporter, 'CHUNK_SIZE', 2):
+            start_row, start, end = list(self.importer.iter_chunk_ranges())[2]
+
+        result = self.importer.import_chunk(start_row, start, end)
+
+        self.assertEqual(result['stats']['created'], 1)
+        self.assertEqual(result['errors'], [{'row': 6, 'error': 'Malformed row: more than 3 fields'}])
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['SKU-4'])
+
+    def test_failed_row_is_recorded_at_its_row(self):
+        """A row the upsert rejects is reported by its position in the file"""
+        upsert_products = CSVImporter.upsert_products
+
+        def reject_sku_3(importer, products):
+            if any(product.sku == 'SKU-3' for product in products):
+                raise IntegrityError('rejected')
+            upsert_products(importer, products)
+
+        with mock.patch.object(CSVImporter, 'CHUNK_SIZE', 2):
+            start_row, start, end = list(self.importer.iter_chunk_ranges())[1]
+        with mock.patch.object(CSVImporter, 'upsert_products', reject_sku_3):
+            result = self.importer.import_chunk(start_row, start, end)
+
+        self.assertEqual(result['stats']['errors'], 1)
+        self.assertEqual(result['errors'], [{'row': 4, 'error': 'SKU SKU-3: rejected'}])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportCSVTests(TestCase):
+    """Sequential imports of a whole file"""
+
+    def test_row_with_extra_fields_is_recorded(self):
+        """A too-long row is an error on its own row, and later rows keep their numbers"""
+        upload_job = UploadJob(file_name='products.csv')
+        upload_job.file_path.save('products.csv', ContentFile(
+            b'name,sku,description\n'
+            b'First,SKU-1,Plain\n'
+            b'Second,SKU-2,"Multi\nline",extra\n'
+            b'Third,SKU-3,Plain\n'
+            b'Fourth,,No SKU\n'
+        ))
+
+        stats = CSVImporter(upload_job.id).import_csv()
+
+        self.assertEqual(stats['processed'], 4)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(
+            list(upload_job.row_errors.order_by('row_number').values_list('row_number', 'error')),
+            [
+                (2, 'Malformed row: more than 3 fields'),
+                (4, 'SKU is required and cannot be empty'),
+            ]
+        )
+        self.assertEqual(sorted(Product.objects.values_list('sku', flat=True)), ['SKU-1', 'SKU-3'])
+
+
+    def test_long_row_at_chunk_start_is_recorded(self):
+        """Rows starting a chunk get the same field check as the rest"""
+        upload_job = UploadJob(file_name='products.csv')
+        upload_job.file_path.save('products.csv', ContentFile(
+            b'name,sku,description\n'
+            b'First,SKU-1,Plain\n'
+            b'Second,SKU-2,Plain,extra,fields\n'
+            b'Third,SKU-3,Plain,extra\n'
+            b'Fourth,SKU-4,Plain\n'
+        ))
+
+        with mock.patch.object(CSVImporter, 'CHUNK_SIZE', 2):
+            stats = CSVImporter(upload_job.id).import_csv()
+
+        self.assertEqual(stats['processed'], 4)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(
+            list(upload_job.row_errors.order_by('row_number').values_list('row_number', flat=True)),
+            [2, 3]
+        )
+        self.assertEqual(sorted(Product.objects.values_list('sku', flat=True)), ['SKU-1', 'SKU-4'])
+
+
+class BulkDeleteTests(TestCase):
+    """Bulk deletion of selected products"""
+
+    def test_deletes_ids_posted_as_strings(self):
+        """The list page posts checkbox values, so ids arrive as strings"""
+        products = Product.objects.bulk_create([
+            Product(sku='SKU-1', name='First'),
+            Product(sku='SKU-2', name='Second'),
+            Product(sku='SKU-3', name='Third'),
+        ])
+
+        deleted = bulk_delete_products([str(product.id) for product in products[:2]])
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['SKU-3'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CleanupUploadJobsTests(TestCase):
+    """Periodic removal of old upload jobs"""
+
+    def make_job(self, age_days, status='completed'):
+        job = UploadJob(file_name='products.csv', status=status)
+        job.file_path.save('products.csv', ContentFile(b'Name,SKU,Description\n'))
+        UploadJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(days=age_days))
+        UploadJobError.objects.create(upload_job=job, row_number=1, error='Missing SKU')
+        return job
+
+    def test_deletes_old_finished_jobs_with_their_files_and_errors(self):
+        """Jobs past the cutoff go in one pass; recent and in-flight jobs stay"""
+        old = self.make_job(31)
+        recent = self.make_job(1)
+        in_flight = self.make_job(31, status='processing')
+
+        deleted = cleanup_old_upload_jobs()
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(set(UploadJob.objects.values_list('pk', flat=True)), {recent.pk, in_flight.pk})
+        self.assertFalse(UploadJobError.objects.filter(upload_job_id=old.pk).exists())
+        self.assertFalse(os.path.exists(old.file_path.path))
+        self.assertTrue(os.path.exists(recent.file_path.path))
@@ -1,8 +1,8 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.http import JsonResponse, StreamingHttpResponse, HttpResponse
+from django.db.models import Q, Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse, HttpResponse
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
@@ -11,10 +11,18 @@ import json
 import time
 import csv
 
-from .models import Product, UploadJob, AuditLog
+from .models import Product, UploadJob, UploadJobError, AuditLog
+from .pagination import EstimatedCountPaginator
+from .services.progress import get_redis, upload_progress_channel
 from .tasks import process_csv_import, bulk_delete_products, export_products_csv, trigger_webhooks
 from webhooks.models import Webhook
 
+UPLOAD_PROGRESS_FALLBACK_INTERVAL = 5  # Seconds without a push before reading the job from the database
+UPLOAD_PROGRESS_FIELDS = (
+    'status', 'total_rows', 'processed_rows', 'created_count',
+    'updated_count', 'skipped_count', 'error_count',
+)
+
 
 def product_list(request):
     """Display paginated list of products with search and filters."""
@@ -50,23 +58,34 @@ def product_list(request):
     else:
         products = products.order_by(f'-{sort_by}')
     
-    # Stats
-    total_count = Product.objects.count()
-    active_count = Product.objects.filter(is_active=True).count()
-    inactive_count = Product.objects.filter(is_active=False).count()
-    last_updated = Product.objects.order_by('-updated_at').first()
+    # Stats (single aggregate query)
+    stats = Product.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        inactive=Count('id', filter=Q(is_active=False)),
+        last_updated=Max('updated_at'),
+    )
     
-    # Pagination
-    paginator = Paginator(products, 50)  # 50 products per page
+    # Pagination; the stats aggregate already has the exact count unless
+    # searching, where the paginator counts at most 10,000 matches
+    if search_query:
+        known_count = None
+    elif status_filter == 'active':
+        known_count = stats['active']
+    elif status_filter == 'inactive':
+        known_count = stats['inactive']
+    else:
+        known_count = stats['total']
+    paginator = EstimatedCountPaginator(products, 50, known_count=known_count)  # 50 products per page
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
     context = {
         'products': page_obj,
-        'total_count': total_count,
-        'active_count': active_count,
-        'inactive_count': inactive_count,
-        'last_updated': last_updated.updated_at if last_updated else None,
+        'total_count': stats['total'],
+        'active_count': stats['active'],
+        'inactive_count': stats['inactive'],
+        'last_updated': stats['last_updated'],
     }
     
     return render(request, 'products/list.html', context)
@@ -76,8 +95,11 @@ def product_detail(request, pk):
     """Display product details."""
     product = get_object_or_404(Product, pk=pk)
     
-    # Get audit logs for this product using the SKU
-    audit_logs = AuditLog.objects.filter(product_sku=product.sku).order_by('-timestamp')[:10]
+    # Get audit logs for this product using the SKU (index range scan on
+    # idx_audit_sku_timestamp; the changes JSON is not rendered)
+    audit_logs = AuditLog.objects.filter(product_sku=product.sku).only(
+        'id', 'product_sku', 'action', 'user', 'timestamp'
+    ).order_by('-timestamp')[:10]
     
     context = {
         'product': product,
@@ -214,13 +236,11 @@ def upload_csv(request):
             
             # Start async processing
             options = {
-                'skip_duplicates': request.POST.get('skip_duplicates') == 'true',
                 'deactivate_missing': request.POST.get('deactivate_missing') == 'true',
             }
             
             task = process_csv_import.delay(upload_job.id, options)
-            upload_job.task_id = task.id
-            upload_job.save()
+            UploadJob.objects.filter(pk=upload_job.pk).update(task_id=task.id)
             
             return JsonResponse({
                 'success': True,
@@ -234,42 +254,82 @@ def upload_csv(request):
     return render(request, 'products/upload.html')
 
 
+def upload_job_progress(job_id):
+    """
+    Progress payload for an upload job, as sent to SSE and polling clients.
+    
+    Reads only the counter columns with .values() rather than loading the
+    whole row; returns None if the job does not exist.
+    """
+    data = UploadJob.objects.filter(id=job_id).values(*UPLOAD_PROGRESS_FIELDS).first()
+    if data is None:
+        return None
+    
+    # Same calculation as UploadJob.progress_percentage
+    total_rows = data['total_rows']
+    data['progress_percentage'] = (
+        int((data['processed_rows'] / total_rows) * 100) if total_rows else 0
+    )
+    data['errors'] = list(
+        UploadJobError.objects.filter(upload_job_id=job_id).values_list('error', flat=True)[:10]
+    )
+    return data
+
+
 def upload_progress(request, job_id):
-    """SSE endpoint for real-time upload progress."""
-    def event_stream():
-        upload_job = get_object_or_404(UploadJob, id=job_id)
+    """SSE endpoint for real-time upload progress, pushed over Redis pub/sub."""
+    # Subscribe before reading the snapshot so no update is missed
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(upload_progress_channel(job_id))
+    
+    data = upload_job_progress(job_id)
+    if data is None:
+        pubsub.close()
+        raise Http404('Upload job not found')
+    
+    def event_stream(data):
+        last_db_read = time.monotonic()
+        last_payload = None
         
-        while True:
-            # Refresh from database
-            upload_job.refresh_from_db()
-            
-            # Prepare progress data
-            data = {
-                'status': upload_job.status,
-                'progress_percentage': upload_job.progress_percentage,
-                'total_rows': upload_job.total_rows,
-                'processed_rows': upload_job.processed_rows,
-                'created_count': upload_job.created_count,
-                'updated_count': upload_job.updated_count,
-                'skipped_count': upload_job.skipped_count,
-                'error_count': upload_job.error_count,
-                'errors': upload_job.errors[:10] if upload_job.errors else [],
-            }
-            
-            # Send event
-            if upload_job.status == 'completed':
-                yield f"event: complete\ndata: {json.dumps(data)}\n\n"
-                break
-            elif upload_job.status == 'failed':
-                yield f"event: error_event\ndata: {json.dumps(data)}\n\n"
-                break
-            else:
-                yield f"data: {json.dumps(data)}\n\n"
-            
-            time.sleep(1)  # Update every second
+        def next_update():
+            """Wait for the next pushed update, falling back to the database"""
+            nonlocal last_db_read
+            while True:
+                message = pubsub.get_message(timeout=UPLOAD_PROGRESS_FALLBACK_INTERVAL)
+                if message is not None:
+                    data = json.loads(message['data'])
+                    if data['status'] not in ('completed', 'failed'):
+                        return data
+                elif time.monotonic() - last_db_read < UPLOAD_PROGRESS_FALLBACK_INTERVAL:
+                    continue
+                
+                # Final state (with errors), or no push for a while
+                # (parallel chunks, lost worker): read the job from the database
+                last_db_read = time.monotonic()
+                return upload_job_progress(job_id)
+        
+        try:
+            while True:
+                payload = json.dumps(data)
+                
+                # Send event
+                if data['status'] == 'completed':
+                    yield f"event: complete\ndata: {payload}\n\n"
+                    break
+                elif data['status'] == 'failed':
+                    yield f"event: error_event\ndata: {payload}\n\n"
+                    break
+                elif payload != last_payload:
+                    # Only send frames that carry a change
+                    yield f"data: {payload}\n\n"
+                    last_payload = payload
+                
+                data = next_update()
+        finally:
+            pubsub.close()
     
     response = StreamingHttpResponse(
-        event_stream(),
+        event_stream(data),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
@@ -280,26 +340,21 @@ def upload_progress(request, job_id):
 
 def upload_status(request, job_id):
     """Get upload job status (polling fallback)."""
-    upload_job = get_object_or_404(UploadJob, id=job_id)
-    
-    data = {
-        'status': upload_job.status,
-        'progress_percentage': upload_job.progress_percentage,
-        'total_rows': upload_job.total_rows,
-        'processed_rows': upload_job.processed_rows,
-        'created_count': upload_job.created_count,
-        'updated_count': upload_job.updated_count,
-        'skipped_count': upload_job.skipped_count,
-        'error_count': upload_job.error_count,
-        'errors': upload_job.errors[:10] if upload_job.errors else [],
-    }
+    data = upload_job_progress(job_id)
+    if data is None:
+        raise Http404('Upload job not found')
     
     return JsonResponse(data)
 
 
 def upload_jobs(request):
     """Display upload job history."""
-    jobs = UploadJob.objects.all().order_by('-created_at')
+    # Only the columns the history table renders; ordered by idx_upload_created
+    jobs = UploadJob.objects.only(
+        'id', 'file_name', 'status', 'total_rows', 'processed_rows',
+        'created_count', 'updated_count', 'error_count',
+        'started_at', 'completed_at', 'created_at'
+    ).order_by('-created_at')
     
     # Pagination
     paginator = Paginator(jobs, 20)
@@ -320,18 +375,14 @@ def bulk_activate(request):
         data = json.loads(request.body)
         product_ids = data.get('product_ids', [])
         
-        # Get SKUs before update for webhook
-        skus = list(Product.objects.filter(id__in=product_ids).values_list('sku', flat=True))
-        
         count = Product.objects.filter(id__in=product_ids).update(is_active=True)
         
-        # Trigger webhook
+        # Trigger webhook (SKUs are added by the task, off the request path)
         if count > 0:
             trigger_webhooks.delay('product.updated', {
                 'action': 'bulk_activate',
                 'count': count,
                 'product_ids': product_ids,
-                'skus': skus[:100],  # Limit for payload size
                 'updated_at': timezone.now().isoformat()
             })
         
@@ -350,18 +401,14 @@ def bulk_deactivate(request):
         data = json.loads(request.body)
         product_ids = data.get('product_ids', [])
         
-        # Get SKUs before update for webhook
-        skus = list(Product.objects.filter(id__in=product_ids).values_list('sku', flat=True))
-        
         count = Product.objects.filter(id__in=product_ids).update(is_active=False)
         
-        # Trigger webhook
+        # Trigger webhook (SKUs are added by the task, off the request path)
         if count > 0:
             trigger_webhooks.delay('product.updated', {
                 'action': 'bulk_deactivate',
                 'count': count,
                 'product_ids': product_ids,
-                'skus': skus[:100],  # Limit for payload size
                 'updated_at': timezone.now().isoformat()
             })
         
@@ -392,10 +439,39 @@ def bulk_delete_view(request):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+class Echo:
+    """Pseudo-buffer for csv.writer that returns each row instead of storing it."""
+    
+    def write(self, value):
+        return value
+
+
 def export_products(request):
-    """Export products to CSV."""
-    # Start async export
-    task = export_products_csv.delay()
+    """Export products to CSV, streamed in the response (?async=1 for a background export)."""
+    if request.GET.get('async') == '1':
+        # Start async export
+        task = export_products_csv.delay()
+        
+        messages.info(request, 'Export started! You will be notified when ready.')
+        return redirect('products:list')
+    
+    writer = csv.writer(Echo())
+    products = Product.objects.values_list(
+        'sku', 'name', 'description', 'is_active', 'created_at'
+    )
+    
+    def rows():
+        yield writer.writerow(['SKU', 'Name', 'Description', 'Status', 'Created At'])
+        for sku, name, description, is_active, created_at in products.iterator(chunk_size=5000):
+            yield writer.writerow((
+                sku,
+                name,
+                description,
+                'Active' if is_active else 'Inactive',
+                created_at.isoformat(sep=' ', timespec='seconds')[:19]
+            ))
     
-    messages.info(request, 'Export started! You will be notified when ready.')
-    return redirect('products:list')
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="products.csv"'
+    
+    return response
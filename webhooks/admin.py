@@ -90,6 +90,8 @@ class WebhookLogAdmin(admin.ModelAdmin):
     ]
     list_filter = ['event_type', 'is_successful', 'created_at']
     search_fields = ['webhook__url', 'event_type', 'error']
+    # webhook_event shows the webhook URL on every row
+    list_select_related = ['webhook']
     readonly_fields = [
         'webhook', 'event_type', 'payload', 'status_code',
         'response_body', 'response_time', 'error', 'is_successful',
@@ -102,6 +104,13 @@ class WebhookLogAdmin(admin.ModelAdmin):
         """Disable adding logs manually"""
         return False
     
+    def get_object(self, request, object_id, from_field=None):
+        """Load the deferred payload and response body for the detail page"""
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            obj.refresh_from_db(fields=['payload', 'response_body'])
+        return obj
+    
     def webhook_event(self, obj):
         """Display webhook and event type"""
         return f"{obj.webhook.url[:30]}... - {obj.event_type}"
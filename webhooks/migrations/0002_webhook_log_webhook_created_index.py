@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-15 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['webhook', '-created_at'], name='idx_webhook_log_wh_created'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-15 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0002_webhook_log_webhook_created_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='webhook',
+            name='idx_webhook_event_active',
+        ),
+        migrations.AddIndex(
+            model_name='webhook',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['event_type'], name='idx_webhook_active_event'),
+        ),
+    ]
@@ -3,6 +3,7 @@ Webhook application models
 """
 
 from django.db import models
+from django.db.models import Q
 from django.core.validators import URLValidator
 from django.utils import timezone
 import secrets
@@ -60,7 +61,8 @@ class Webhook(models.Model):
         db_table = 'webhooks'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['event_type', 'is_active'], name='idx_webhook_event_active'),
+            # Dispatcher lookup (active webhooks for an event type); inactive rows aren't indexed
+            models.Index(fields=['event_type'], name='idx_webhook_active_event', condition=Q(is_active=True)),
             models.Index(fields=['-created_at'], name='idx_webhook_created'),
         ]
         verbose_name = 'Webhook'
@@ -75,23 +77,6 @@ class Webhook(models.Model):
             self.secret = secrets.token_urlsafe(32)
         super().save(*args, **kwargs)
 
-    def record_trigger(self, success=True):
-        """Record a webhook trigger attempt"""
-        self.total_triggers += 1
-        self.last_triggered_at = timezone.now()
-        
-        if success:
-            self.successful_triggers += 1
-            self.last_success_at = timezone.now()
-        else:
-            self.failed_triggers += 1
-            self.last_failure_at = timezone.now()
-        
-        self.save(update_fields=[
-            'total_triggers', 'successful_triggers', 'failed_triggers',
-            'last_triggered_at', 'last_success_at', 'last_failure_at'
-        ])
-
     @property
     def success_rate(self):
         """Calculate success rate percentage"""
@@ -100,6 +85,24 @@ class Webhook(models.Model):
         return int((self.successful_triggers / self.total_triggers) * 100)
 
 
+class WebhookLogQuerySet(models.QuerySet):
+    """QuerySet for webhook logs"""
+
+    def with_bodies(self):
+        """Also load the payload and response_body columns deferred by default"""
+        return self.defer(None)
+
+
+class WebhookLogManager(models.Manager.from_queryset(WebhookLogQuerySet)):
+    """
+    Default manager for webhook logs
+    Defers the potentially large payload and response_body columns
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('payload', 'response_body')
+
+
 class WebhookLog(models.Model):
     """
     Log of webhook delivery attempts
@@ -127,13 +130,18 @@ class WebhookLog(models.Model):
     is_successful = models.BooleanField(default=False, db_index=True)
     retry_count = models.IntegerField(default=0)
     
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set when the log is built (at delivery), not when its batch is inserted
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = WebhookLogManager()
 
     class Meta:
         db_table = 'webhook_logs'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at'], name='idx_webhook_log_created'),
+            # Serves the per-webhook log page: filter and ORDER BY in one index range scan
+            models.Index(fields=['webhook', '-created_at'], name='idx_webhook_log_wh_created'),
             models.Index(fields=['is_successful'], name='idx_webhook_log_success'),
             models.Index(fields=['event_type'], name='idx_webhook_log_event'),
         ]
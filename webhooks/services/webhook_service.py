@@ -1,2 +1,224 @@
-# Webhook service will be created
-pass
+"""
+Webhook Service
+Cached lookups of webhook configuration for event dispatch
+"""
+
+import hashlib
+import hmac
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_WEBHOOKS_TIMEOUT = 60  # Seconds to cache active webhook ids per event type
+ACTIVE_WEBHOOKS_LOCK_TIMEOUT = 10  # Seconds a cache repopulation lock is held at most
+WEBHOOK_CONFIG_VERSION_TIMEOUT = 24 * 60 * 60  # Seconds a webhook's shared config version is kept
+WEBHOOK_CONFIG_MAXSIZE = 1024  # Webhook configs kept per worker process
+WEBHOOK_LIST_CACHE_KEY = 'webhooks:list'
+WEBHOOK_LIST_TIMEOUT = 30  # Seconds the webhook list page reuses its rows (delivery stats lag by this much)
+
+
+WEBHOOK_USER_AGENT = 'ProductImporter-Webhook/1.0'
+
+
+@dataclass(frozen=True)
+class WebhookConfig:
+    """Delivery settings of a webhook, detached from the ORM"""
+    id: int
+    url: str
+    secret: str
+    event_type: str
+    is_active: bool
+    
+    @cached_property
+    def headers(self) -> Mapping[str, str]:
+        """Request headers shared by every delivery (all but the signature), built once"""
+        return MappingProxyType({
+            'Content-Type': 'application/json',
+            'X-Event-Type': self.event_type,
+            'User-Agent': WEBHOOK_USER_AGENT,
+        })
+    
+    @cached_property
+    def secret_bytes(self) -> bytes:
+        """Secret encoded once for signing"""
+        return self.secret.encode('utf-8')
+    
+    @cached_property
+    def signer(self) -> hmac.HMAC:
+        """HMAC-SHA256 keyed with the secret; copy() it per message to skip re-deriving the key pads"""
+        return hmac.new(self.secret_bytes, digestmod=hashlib.sha256)
+
+
+# Per-process cache: webhook id -> (shared config version it was loaded under, config)
+_webhook_configs: Dict[int, Tuple[datetime, WebhookConfig]] = {}
+
+
+def active_webhooks_cache_key(event_type: str) -> str:
+    """Cache key holding the active webhook ids for an event type"""
+    return f'webhooks:active:{event_type}'
+
+
+def get_active_webhook_ids(event_type: str) -> List[int]:
+    """
+    Get ids of active webhooks subscribed to an event type
+    Served from cache; on a miss only one caller repopulates it
+    
+    Args:
+        event_type: Type of event
+        
+    Returns:
+        List of webhook ids (empty when nothing is subscribed)
+    """
+    from webhooks.models import Webhook
+    
+    cache_key = active_webhooks_cache_key(event_type)
+    webhook_ids = cache.get(cache_key)
+    if webhook_ids is not None:
+        return webhook_ids
+    
+    # cache.add is atomic, so only one of several concurrent misses
+    # repopulates the key; the others read the database without writing
+    lock_key = f'{cache_key}:lock'
+    is_owner = cache.add(lock_key, 1, ACTIVE_WEBHOOKS_LOCK_TIMEOUT)
+    try:
+        webhook_ids = list(
+            Webhook.objects.filter(
+                event_type=event_type,
+                is_active=True
+            ).values_list('id', flat=True)
+        )
+        if is_owner:
+            cache.set(cache_key, webhook_ids, ACTIVE_WEBHOOKS_TIMEOUT)
+    finally:
+        if is_owner:
+            cache.delete(lock_key)
+    
+    return webhook_ids
+
+
+def invalidate_active_webhooks() -> None:
+    """Drop cached active webhook ids for every event type"""
+    from webhooks.models import Webhook
+    
+    # A save can move a webhook between event types, so clear them all
+    cache.delete_many([
+        active_webhooks_cache_key(event_type)
+        for event_type, _ in Webhook.EVENT_CHOICES
+    ])
+
+
+def get_webhook_list() -> list:
+    """
+    Get all webhooks, newest first, for the webhook list page
+    Cached until a webhook is saved or deleted, or WEBHOOK_LIST_TIMEOUT passes
+    
+    Returns:
+        List of Webhook instances
+    """
+    from webhooks.models import Webhook
+    
+    return cache.get_or_set(
+        WEBHOOK_LIST_CACHE_KEY,
+        lambda: list(
+            # Only the columns the list page shows
+            Webhook.objects.only(
+                'id', 'url', 'event_type', 'is_active', 'total_triggers',
+                'successful_triggers', 'failed_triggers', 'last_triggered_at', 'created_at'
+            ).order_by('-created_at')
+        ),
+        WEBHOOK_LIST_TIMEOUT
+    )
+
+
+def invalidate_webhook_list() -> None:
+    """Drop the cached webhook list"""
+    cache.delete(WEBHOOK_LIST_CACHE_KEY)
+
+
+def webhook_config_version_key(webhook_id: int) -> str:
+    """Cache key holding the updated_at a webhook's config was last changed at"""
+    return f'webhooks:config:{webhook_id}:version'
+
+
+def get_webhook_config(webhook_id: int) -> WebhookConfig:
+    """
+    Get a webhook's delivery settings, cached in this process
+    Each lookup is one shared-cache GET of the webhook's version, so an edit or
+    toggle made in any process reaches every worker on its next delivery, while
+    a burst of deliveries and retries to one webhook reads its row once
+    
+    Args:
+        webhook_id: ID of the Webhook
+        
+    Returns:
+        WebhookConfig for the webhook
+        
+    Raises:
+        Webhook.DoesNotExist: If the webhook was deleted
+    """
+    from webhooks.models import Webhook
+    
+    version_key = webhook_config_version_key(webhook_id)
+    version = cache.get(version_key)
+    entry = _webhook_configs.get(webhook_id)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry[1]
+    
+    *fields, updated_at = Webhook.objects.values_list(
+        'id', 'url', 'secret', 'event_type', 'is_active', 'updated_at'
+    ).get(id=webhook_id)
+    config = WebhookConfig(*fields)
+    
+    if version is None:
+        # No version published (or it expired): the row's own is current, unless
+        # an edit has committed since the read, in which case add() loses to it
+        version = updated_at
+        cache.add(version_key, version, WEBHOOK_CONFIG_VERSION_TIMEOUT)
+    
+    if len(_webhook_configs) >= WEBHOOK_CONFIG_MAXSIZE:
+        _webhook_configs.clear()
+    # Stored under the version read before the row, so an edit committed in
+    # between makes the next lookup reload
+    _webhook_configs[webhook_id] = (version, config)
+    return config
+
+
+def publish_webhook_config(webhook_id: int, updated_at: datetime) -> None:
+    """
+    Tell every process a webhook's config changed, once the change is committed
+    
+    Args:
+        webhook_id: ID of the changed Webhook
+        updated_at: The webhook's new updated_at
+    """
+    # Published after commit, so a worker that sees the new version also reads the new row
+    transaction.on_commit(lambda: cache.set(
+        webhook_config_version_key(webhook_id), updated_at, WEBHOOK_CONFIG_VERSION_TIMEOUT
+    ))
+
+
+def forget_webhook_config(webhook_id: int) -> None:
+    """Drop a deleted webhook's config from this process and the shared cache"""
+    _webhook_configs.pop(webhook_id, None)
+    cache.delete(webhook_config_version_key(webhook_id))
+
+
+def invalidate_webhook_caches(webhook_id: int, updated_at: datetime) -> None:
+    """
+    Drop every cached view of a webhook after a change made with
+    QuerySet.update(), which bypasses the model's save signals
+    
+    Args:
+        webhook_id: ID of the changed Webhook
+        updated_at: The updated_at written with the change
+    """
+    publish_webhook_config(webhook_id, updated_at)
+    invalidate_webhook_list()
+    invalidate_active_webhooks()
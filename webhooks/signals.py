@@ -0,0 +1,34 @@
+"""
+Webhook signal handlers
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Webhook
+from .services.webhook_service import (
+    forget_webhook_config,
+    invalidate_active_webhooks,
+    invalidate_webhook_list,
+    publish_webhook_config,
+)
+
+
+@receiver(post_save, sender=Webhook)
+def clear_webhook_caches_on_save(sender, instance, update_fields=None, **kwargs):
+    """Invalidate cached webhook config and list, and active ids when a webhook's routing changes"""
+    publish_webhook_config(instance.pk, instance.updated_at)
+    invalidate_webhook_list()
+    
+    # Saves that only touch statistics don't change who is subscribed
+    if update_fields is not None and not {'event_type', 'is_active'} & set(update_fields):
+        return
+    invalidate_active_webhooks()
+
+
+@receiver(post_delete, sender=Webhook)
+def clear_webhook_caches_on_delete(sender, instance, **kwargs):
+    """Invalidate cached webhook config, list and active ids when a webhook is deleted"""
+    forget_webhook_config(instance.pk)
+    invalidate_webhook_list()
+    invalidate_active_webhooks()
@@ -4,96 +4,286 @@ Webhook Celery tasks
 
 import logging
 import requests
-import hmac
-import hashlib
+import json
+import threading
 import time
-from celery import shared_task
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from celery import group, shared_task
+from celery.signals import worker_process_init
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# Delivery logs and statistics are buffered while a delivery task runs and
+# written together when it finishes
+_buffer_lock = threading.Lock()
+_log_buffer = []
+_stats_buffer = {}
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+# Keep-alive connection pool shared by deliveries in this worker process
+HTTP_POOL_CONNECTIONS = 32
+HTTP_POOL_MAXSIZE = 64
+
+_http_session = None
+
+# Fan-out: webhooks per send_webhook_batch task, and concurrent requests within it
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_BATCH_CONCURRENCY = 16
+
+# Broker publish retries when queueing deliveries
+PUBLISH_RETRY_POLICY = {
+    'max_retries': 3,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.5,
+}
+
+WEBHOOK_LOG_DELETE_BATCH_SIZE = 10000  # Old logs removed per DELETE statement
+WEBHOOK_RESPONSE_PREVIEW_BYTES = 1000  # Response body bytes kept in a delivery log
+
+
+def get_http_session():
+    """
+    Return this process's pooled HTTP session, creating it on first use
+    
+    Returns:
+        requests.Session reusing TCP/TLS connections across deliveries
+    """
+    global _http_session
+    
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=0  # Retries are handled by the task
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _http_session = session
+    return _http_session
+
+
+@worker_process_init.connect
+def reset_http_session(**kwargs):
+    """Don't share sockets inherited from the parent across forked pool processes"""
+    global _http_session
+    _http_session = None
+
+
+def _buffer_delivery(log, success=True):
+    """
+    Queue a delivery log and its statistics until the task flushes them
+    
+    Args:
+        log: Unsaved WebhookLog instance
+        success: Whether the delivery succeeded
+    """
+    now = timezone.now()
+    with _buffer_lock:
+        _log_buffer.append(log)
+        
+        stats = _stats_buffer.setdefault(log.webhook_id, {
+            'total': 0, 'successful': 0, 'failed': 0,
+            'last_success_at': None, 'last_failure_at': None,
+        })
+        stats['total'] += 1
+        stats['last_triggered_at'] = now
+        if success:
+            stats['successful'] += 1
+            stats['last_success_at'] = now
+        else:
+            stats['failed'] += 1
+            stats['last_failure_at'] = now
+
+
+def flush_buffered_webhook_logs():
+    """
+    Write the buffered delivery logs and statistics
+    
+    Logs are inserted with one bulk_create; each webhook's counters get a
+    single F() UPDATE so concurrent workers don't overwrite each other.
+    
+    Returns:
+        Number of logs written
+    """
+    from webhooks.models import Webhook, WebhookLog
+    from django.db.models import F
+    
+    with _buffer_lock:
+        logs = _log_buffer[:]
+        stats_by_webhook = dict(_stats_buffer)
+        _log_buffer.clear()
+        _stats_buffer.clear()
+    
+    if not logs:
+        return 0
+    
+    # Skip logs for webhooks deleted since the delivery
+    existing_ids = set(
+        Webhook.objects.filter(pk__in=stats_by_webhook).values_list('id', flat=True)
+    )
+    WebhookLog.objects.bulk_create(
+        [log for log in logs if log.webhook_id in existing_ids],
+        batch_size=500
+    )
+    
+    for webhook_id, stats in stats_by_webhook.items():
+        if webhook_id not in existing_ids:
+            continue
+        fields = {
+            'total_triggers': F('total_triggers') + stats['total'],
+            'successful_triggers': F('successful_triggers') + stats['successful'],
+            'failed_triggers': F('failed_triggers') + stats['failed'],
+            'last_triggered_at': stats['last_triggered_at'],
+        }
+        if stats['last_success_at']:
+            fields['last_success_at'] = stats['last_success_at']
+        if stats['last_failure_at']:
+            fields['last_failure_at'] = stats['last_failure_at']
+        Webhook.objects.filter(pk=webhook_id).update(**fields)
+    
+    return len(logs)
+
+
+def _payload_body(payload):
+    """
+    Get the request body for a payload, serializing only if the producer hasn't
+    
+    Args:
+        payload: Event data, or its JSON text as pre-serialized by enqueue_webhooks
+        
+    Returns:
+        Tuple of (body bytes, payload data for the delivery log)
+    """
+    if isinstance(payload, str):
+        return payload.encode('utf-8'), json.loads(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8'), payload
+
+
+def _sign(body, webhook):
+    """
+    Sign exactly the bytes that are sent
+    
+    Args:
+        body: Request body bytes
+        webhook: WebhookConfig whose secret signs the body
+        
+    Returns:
+        Hex HMAC-SHA256 signature
+    """
+    signer = webhook.signer.copy()
+    signer.update(body)
+    return signer.hexdigest()
+
+
+def _post_webhook(webhook, body):
+    """
+    Sign and POST an event body to a webhook
+    
+    Args:
+        webhook: WebhookConfig to deliver to
+        body: JSON request body bytes
+        
+    Returns:
+        Tuple of (status_code, response_body preview, response_time)
+    """
+    # Generate HMAC signature over the exact request body
+    headers = {**webhook.headers, 'X-Webhook-Signature': _sign(body, webhook)}
+    
+    start_time = time.time()
+    response = get_http_session().post(
+        webhook.url,
+        data=body,
+        headers=headers,
+        timeout=30,
+        stream=True
+    )
+    try:
+        # Read only what is logged, however large the endpoint's response is
+        preview = response.raw.read(WEBHOOK_RESPONSE_PREVIEW_BYTES, decode_content=True)
+    except urllib3.exceptions.HTTPError as e:
+        # Surface read failures like any other failed request
+        raise requests.ConnectionError(e) from e
+    finally:
+        if response.raw.closed:
+            # Whole body read: the keep-alive connection goes back to the pool
+            response.raw.release_conn()
+        else:
+            # Cut off a larger body: drop the connection rather than drain it
+            response.close()
+    response_time = time.time() - start_time
+    
+    return response.status_code, preview.decode('utf-8', errors='replace'), response_time
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, compression='gzip')
 def send_webhook(self, webhook_id, payload):
     """
     Send webhook POST request with retries
     
     Args:
         webhook_id: ID of the Webhook
-        payload: Data to send
+        payload: Data to send (a dict, or its JSON text)
         
     Returns:
-        Response status code
+        Response status code, or None if the webhook has been deactivated
     """
-    from webhooks.models import Webhook, WebhookLog
+    from webhooks.models import WebhookLog
+    from webhooks.services.webhook_service import get_webhook_config
     
     try:
-        webhook = Webhook.objects.get(id=webhook_id)
-        
-        # Generate HMAC signature
-        secret = webhook.secret.encode('utf-8')
-        message = str(payload).encode('utf-8')
-        signature = hmac.new(secret, message, hashlib.sha256).hexdigest()
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'X-Webhook-Signature': signature,
-            'X-Event-Type': webhook.event_type,
-            'User-Agent': 'ProductImporter-Webhook/1.0'
-        }
+        # Delivery settings, cached per worker process
+        webhook = get_webhook_config(webhook_id)
+        
+        # Deactivated since the event was queued (or between retries)
+        if not webhook.is_active:
+            logger.info(f"Webhook {webhook_id} is inactive, skipping delivery")
+            return None
         
         # Send request with timeout
-        start_time = time.time()
-        response = requests.post(
-            webhook.url,
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
-        response_time = time.time() - start_time
+        body, data = _payload_body(payload)
+        status_code, response_body, response_time = _post_webhook(webhook, body)
         
         # Log the attempt
-        is_successful = 200 <= response.status_code < 300
+        is_successful = 200 <= status_code < 300
         
-        WebhookLog.objects.create(
-            webhook=webhook,
+        _buffer_delivery(WebhookLog(
+            webhook_id=webhook.id,
             event_type=webhook.event_type,
-            payload=payload,
-            status_code=response.status_code,
-            response_body=response.text[:1000],  # Limit to 1000 chars
+            payload=data,
+            status_code=status_code,
+            response_body=response_body,
             response_time=response_time,
             is_successful=is_successful,
             retry_count=self.request.retries
-        )
-        
-        # Update webhook statistics
-        webhook.record_trigger(success=is_successful)
+        ), success=is_successful)
         
         if not is_successful:
             logger.warning(
-                f"Webhook {webhook_id} returned {response.status_code}"
+                f"Webhook {webhook_id} returned {status_code}"
             )
             # Retry on failure
-            raise Exception(f"Webhook failed with status {response.status_code}")
+            raise Exception(f"Webhook failed with status {status_code}")
         
         logger.info(f"Webhook {webhook_id} delivered successfully in {response_time:.2f}s")
-        return response.status_code
+        return status_code
         
     except requests.RequestException as e:
         logger.error(f"Webhook {webhook_id} request failed: {e}")
         
         # Log the error
         try:
-            webhook = Webhook.objects.get(id=webhook_id)
-            WebhookLog.objects.create(
-                webhook=webhook,
+            _buffer_delivery(WebhookLog(
+                webhook_id=webhook.id,
                 event_type=webhook.event_type,
-                payload=payload,
+                payload=data,
                 error=str(e),
                 is_successful=False,
                 retry_count=self.request.retries
-            )
-            webhook.record_trigger(success=False)
+            ), success=False)
         except Exception:
             pass
         
@@ -103,6 +293,133 @@ def send_webhook(self, webhook_id, payload):
     except Exception as e:
         logger.error(f"Webhook {webhook_id} failed: {e}")
         raise
+    
+    finally:
+        # Write this attempt's log and statistics before the task ends
+        flush_buffered_webhook_logs()
+
+
+@shared_task(compression='gzip')
+def send_webhook_batch(webhook_ids, payload):
+    """
+    Deliver one event to several webhooks concurrently from a single task
+    
+    Deliveries are network-bound, so they run on a thread pool while this
+    task's thread does the database work (config lookups and logging).
+    Requests that fail outright are handed to send_webhook for its retries.
+    
+    Args:
+        webhook_ids: IDs of the Webhooks
+        payload: Data to send (a dict, or its JSON text)
+        
+    Returns:
+        Number of successful deliveries
+    """
+    from webhooks.models import WebhookLog
+    from webhooks.services.webhook_service import get_webhook_config
+    
+    webhooks = []
+    for webhook_id in webhook_ids:
+        try:
+            webhook = get_webhook_config(webhook_id)
+        except Exception as e:
+            logger.error(f"Webhook {webhook_id} failed: {e}")
+            continue
+        # Skip webhooks deactivated since the event was queued
+        if webhook.is_active:
+            webhooks.append(webhook)
+    if not webhooks:
+        return 0
+    
+    try:
+        # Serialized (or decoded, for the logs) once for the whole batch
+        body, data = _payload_body(payload)
+        
+        def post(webhook):
+            try:
+                return _post_webhook(webhook, body)
+            except requests.RequestException as e:
+                return e
+        
+        workers = min(WEBHOOK_BATCH_CONCURRENCY, len(webhooks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(post, webhooks))
+        
+        delivered = 0
+        for webhook, result in zip(webhooks, results):
+            if isinstance(result, requests.RequestException):
+                logger.error(f"Webhook {webhook.id} request failed: {result}")
+                _buffer_delivery(WebhookLog(
+                    webhook_id=webhook.id,
+                    event_type=webhook.event_type,
+                    payload=data,
+                    error=str(result),
+                    is_successful=False
+                ), success=False)
+                # This was the first attempt, so send_webhook continues from its first retry
+                send_webhook.apply_async(
+                    (webhook.id, payload), retries=1, countdown=send_webhook.default_retry_delay
+                )
+                continue
+            
+            status_code, response_body, response_time = result
+            is_successful = 200 <= status_code < 300
+            _buffer_delivery(WebhookLog(
+                webhook_id=webhook.id,
+                event_type=webhook.event_type,
+                payload=data,
+                status_code=status_code,
+                response_body=response_body,
+                response_time=response_time,
+                is_successful=is_successful
+            ), success=is_successful)
+            
+            if is_successful:
+                delivered += 1
+            else:
+                logger.warning(f"Webhook {webhook.id} returned {status_code}")
+    
+    finally:
+        # The whole batch's logs in one bulk_create, and one UPDATE per webhook,
+        # even if the batch stopped partway
+        flush_buffered_webhook_logs()
+    
+    logger.info(f"Delivered {delivered}/{len(webhooks)} webhooks in batch")
+    return delivered
+
+
+def enqueue_webhooks(event_type, payload, webhook_ids=None):
+    """
+    Queue a delivery of an event to every active webhook subscribed to it
+    
+    Deliveries go to the broker as one group of send_webhook_batch tasks,
+    over one producer connection, instead of a .delay() round-trip per webhook.
+    
+    Args:
+        event_type: Type of event
+        payload: Event payload data
+        webhook_ids: Already-resolved webhook ids (looked up from the cache if omitted)
+        
+    Returns:
+        Number of deliveries queued
+    """
+    from webhooks.services.webhook_service import get_active_webhook_ids
+    
+    if webhook_ids is None:
+        webhook_ids = get_active_webhook_ids(event_type)
+    if not webhook_ids:
+        return 0
+    
+    # Serialize once here rather than once per delivery in the workers
+    payload_json = json.dumps(payload, separators=(',', ':'))
+    
+    # Ride out a broker blip, but give up after about a second rather than
+    # stall the caller on Celery's default publish retries
+    group(
+        send_webhook_batch.s(webhook_ids[i:i + WEBHOOK_BATCH_SIZE], payload_json)
+        for i in range(0, len(webhook_ids), WEBHOOK_BATCH_SIZE)
+    ).apply_async(retry_policy=PUBLISH_RETRY_POLICY)
+    return len(webhook_ids)
 
 
 @shared_task
@@ -116,10 +433,10 @@ def test_webhook(webhook_id):
     Returns:
         Tuple of (success, message, response_time)
     """
-    from webhooks.models import Webhook
+    from webhooks.services.webhook_service import get_webhook_config
     
     try:
-        webhook = Webhook.objects.get(id=webhook_id)
+        webhook = get_webhook_config(webhook_id)
         
         test_payload = {
             'event': 'test',
@@ -127,23 +444,16 @@ def test_webhook(webhook_id):
             'timestamp': timezone.now().isoformat()
         }
         
-        # Generate HMAC signature
-        secret = webhook.secret.encode('utf-8')
-        message = str(test_payload).encode('utf-8')
-        signature = hmac.new(secret, message, hashlib.sha256).hexdigest()
+        # Generate HMAC signature over the exact request body
+        body, _ = _payload_body(test_payload)
         
-        headers = {
-            'Content-Type': 'application/json',
-            'X-Webhook-Signature': signature,
-            'X-Event-Type': 'test',
-            'User-Agent': 'ProductImporter-Webhook/1.0'
-        }
+        headers = {**webhook.headers, 'X-Webhook-Signature': _sign(body, webhook), 'X-Event-Type': 'test'}
         
         # Send request
         start_time = time.time()
-        response = requests.post(
+        response = get_http_session().post(
             webhook.url,
-            json=test_payload,
+            data=body,
             headers=headers,
             timeout=10
         )
@@ -179,9 +489,19 @@ def cleanup_old_webhook_logs(days=30):
     try:
         cutoff_date = timezone.now() - timedelta(days=days)
         
-        count, _ = WebhookLog.objects.filter(
-            created_at__lt=cutoff_date
-        ).delete()
+        # Bounded batches keep memory flat and each DELETE short; WebhookLog has
+        # no dependents or signals, so _raw_delete can skip the collector
+        count = 0
+        while True:
+            ids = list(
+                WebhookLog.objects.filter(created_at__lt=cutoff_date)
+                .order_by()
+                .values_list('pk', flat=True)[:WEBHOOK_LOG_DELETE_BATCH_SIZE]
+            )
+            if not ids:
+                break
+            batch = WebhookLog.objects.filter(pk__in=ids)
+            count += batch._raw_delete(batch.db)
         
         logger.info(f"Deleted {count} old webhook logs")
         return count
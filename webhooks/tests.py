@@ -1,3 +1,113 @@
+from unittest import mock
+
+import requests
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from webhooks import tasks
+from webhooks.models import Webhook, WebhookLog
+from webhooks.services import webhook_service
+
+
+class SendWebhookBatchTests(TestCase):
+    """Batched deliveries and their buffered logs"""
+
+    def setUp(self):
+        self.webhooks = [
+            Webhook.objects.create(url=f'https://example.com/hook/{i}', event_type='product.created')
+            for i in range(2)
+        ]
+
+    def test_logs_are_written_when_the_batch_ends(self):
+        """Nothing is left in the process buffer once the task returns"""
+        before = timezone.now()
+        with mock.patch.object(tasks, '_post_webhook', return_value=(200, 'ok', 0.01)):
+            delivered = tasks.send_webhook_batch([webhook.id for webhook in self.webhooks], {'id': 1})
+
+        self.assertEqual(delivered, 2)
+        self.assertEqual(tasks._log_buffer, [])
+        self.assertEqual(tasks._stats_buffer, {})
+        self.assertEqual(WebhookLog.objects.filter(is_successful=True).count(), 2)
+        self.assertEqual(
+            list(Webhook.objects.values_list('total_triggers', 'successful_triggers')),
+            [(1, 1), (1, 1)]
+        )
+        self.assertTrue(all(log.created_at >= before for log in WebhookLog.objects.all()))
+
+    def test_failed_request_is_retried_as_its_second_attempt(self):
+        """send_webhook picks up after the batch's attempt rather than starting over"""
+        error = requests.ConnectionError('refused')
+        with mock.patch.object(tasks, '_post_webhook', side_effect=error), \
+                mock.patch.object(tasks.send_webhook, 'apply_async') as apply_async:
+            delivered = tasks.send_webhook_batch([self.webhooks[0].id], {'id': 1})
+
+        self.assertEqual(delivered, 0)
+        self.assertEqual(apply_async.call_args.kwargs['retries'], 1)
+        self.assertEqual(WebhookLog.objects.get().error, 'refused')
+
+    def test_logs_are_written_when_the_batch_fails(self):
+        """An unexpected error doesn't leave earlier deliveries in the buffer"""
+        buffer_delivery = tasks._buffer_delivery
+
+        def fail_second(log, success=True):
+            if tasks._log_buffer:
+                raise RuntimeError('boom')
+            buffer_delivery(log, success)
+
+        with mock.patch.object(tasks, '_post_webhook', return_value=(200, 'ok', 0.01)), \
+                mock.patch.object(tasks, '_buffer_delivery', side_effect=fail_second):
+            with self.assertRaises(RuntimeError):
+                tasks.send_webhook_batch([webhook.id for webhook in self.webhooks], {'id': 1})
+
+        self.assertEqual(tasks._log_buffer, [])
+        self.assertEqual(WebhookLog.objects.count(), 1)
+
+    def test_log_keeps_delivery_time(self):
+        """created_at is when the delivery happened, not when its batch was inserted"""
+        log = WebhookLog(webhook=self.webhooks[0], event_type='product.created', payload={})
+        delivered_at = log.created_at
+
+        WebhookLog.objects.bulk_create([log])
+
+        self.assertEqual(WebhookLog.objects.get().created_at, delivered_at)
+
+
+class WebhookConfigCacheTests(TestCase):
+    """Worker-side webhook configs following edits made in other processes"""
+
+    def setUp(self):
+        cache.clear()
+        webhook_service._webhook_configs.clear()
+        self.webhook = Webhook.objects.create(url='https://example.com/hook', event_type='product.created')
+
+    def test_toggle_reaches_a_cached_config(self):
+        """A worker's copy loaded before a toggle isn't served after it"""
+        self.assertTrue(webhook_service.get_webhook_config(self.webhook.pk).is_active)
+
+        # Toggled from the web process, which doesn't share this one's memory
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(webhook_service, '_webhook_configs', {}):
+            self.client.post(reverse('webhooks:toggle', args=[self.webhook.pk]))
+
+        self.assertFalse(webhook_service.get_webhook_config(self.webhook.pk).is_active)
+
+    def test_edit_in_another_process_reaches_a_cached_config(self):
+        """A worker's copy is reloaded after the web process saves the webhook"""
+        webhook_service.get_webhook_config(self.webhook.pk)
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(webhook_service, '_webhook_configs', {}):
+            self.webhook.url = 'https://example.com/moved'
+            self.webhook.save()
+
+        self.assertEqual(webhook_service.get_webhook_config(self.webhook.pk).url, 'https://example.com/moved')
+
+    def test_unchanged_config_is_not_reloaded(self):
+        """Repeat lookups cost a cache read, not a query"""
+        webhook_service.get_webhook_config(self.webhook.pk)
 
-# Create your tests here.
+        with self.assertNumQueries(0):
+            webhook_service.get_webhook_config(self.webhook.pk)
@@ -1,17 +1,23 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.db.models import F
+from django.http import Http404, JsonResponse
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 import json
 
+from products.pagination import EstimatedCountPaginator
+
 from .models import Webhook, WebhookLog
+from .services.webhook_service import get_webhook_list, invalidate_webhook_caches
 from .tasks import test_webhook
 
 
 def webhook_list(request):
     """Display list of webhooks."""
-    webhooks = Webhook.objects.all().order_by('-created_at')
+    # Cached rows; paginating the list needs no COUNT query
+    webhooks = get_webhook_list()
     
     # Pagination
     paginator = Paginator(webhooks, 20)
@@ -111,10 +117,14 @@ def webhook_test(request, pk):
 def webhook_logs(request, pk):
     """View webhook delivery logs."""
     webhook = get_object_or_404(Webhook, pk=pk)
-    logs = WebhookLog.objects.filter(webhook=webhook).order_by('-created_at')
+    # Only the columns the table shows; payload and response_body can be large
+    logs = WebhookLog.objects.filter(webhook=webhook).only(
+        'id', 'webhook_id', 'event_type', 'status_code', 'response_time',
+        'is_successful', 'created_at'
+    ).order_by('-created_at')
     
-    # Pagination
-    paginator = Paginator(logs, 50)
+    # Pagination (estimated total instead of a COUNT(*) over every log row)
+    paginator = EstimatedCountPaginator(logs, 50)
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
@@ -130,13 +140,21 @@ def webhook_logs(request, pk):
 def webhook_toggle(request, pk):
     """Toggle webhook active status (AJAX endpoint)."""
     try:
-        webhook = get_object_or_404(Webhook, pk=pk)
-        webhook.is_active = not webhook.is_active
-        webhook.save()
+        # Flip the flag in the database in one UPDATE instead of SELECT + full-row save
+        updated_at = timezone.now()
+        updated = Webhook.objects.filter(pk=pk).update(
+            is_active=~F('is_active'),
+            updated_at=updated_at
+        )
+        if not updated:
+            raise Http404('No Webhook matches the given query.')
+        invalidate_webhook_caches(pk, updated_at)
+        
+        is_active = Webhook.objects.filter(pk=pk).values_list('is_active', flat=True).first()
         
         return JsonResponse({
             'success': True,
-            'is_active': webhook.is_active
+            'is_active': is_active
         })
     except Exception as e:
         return JsonResponse({